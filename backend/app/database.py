@@ -25,8 +25,13 @@ if _use_nullpool:
     from sqlalchemy.pool import NullPool as _NullPool
     _engine_kwargs["poolclass"] = _NullPool
 else:
-    _engine_kwargs["pool_size"] = 5
-    _engine_kwargs["max_overflow"] = 10
+    # Matches DatabaseOptimization.get_connection_pool_config: enough
+    # warm connections to avoid handshakes on the request path, recycled
+    # hourly so idle-timeout proxies don't hand us dead sockets
+    _engine_kwargs["pool_size"] = 20
+    _engine_kwargs["max_overflow"] = 40
+    _engine_kwargs["pool_recycle"] = 3600
+    _engine_kwargs["pool_timeout"] = 30
 
 try:
     engine = create_engine(DATABASE_URL, **_engine_kwargs)
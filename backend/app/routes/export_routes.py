@@ -11,8 +11,9 @@ import logging
 from app.database import get_db
 from app.services.export import ExportService
 from app.schemas.export import (
-    QuotePDFRequest, QuoteEmailRequest, 
-    QuoteTemplateCreate, QuoteTemplateUpdate, QuoteERPExportRequest
+    QuotePDFRequest, QuoteEmailRequest,
+    QuoteTemplateCreate, QuoteTemplateBulkCreate, QuoteTemplateUpdate,
+    QuoteERPExportRequest
 )
 from app.routes.auth_routes import get_current_user
 
@@ -162,6 +163,31 @@ async def create_quote_template(
             detail="Failed to create template"
         )
 
+@router.post("/quote-templates/bulk", status_code=status.HTTP_201_CREATED)
+async def create_quote_templates_bulk(
+    request: QuoteTemplateBulkCreate,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create multiple quote templates in one transaction"""
+    try:
+        result = await ExportService.create_quote_templates_bulk(
+            user_id=current_user["user_id"],
+            items=[item.dict() for item in request.items],
+            db=db
+        )
+
+        return {
+            "success": True,
+            "data": result
+        }
+    except Exception as e:
+        logger.error(f"Error bulk-creating templates: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to bulk-create templates"
+        )
+
 @router.get("/quote-templates")
 async def list_quote_templates(
     current_user: dict = Depends(get_current_user),
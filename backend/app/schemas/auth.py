@@ -26,11 +26,22 @@ class SignupRequest(BaseModel):
         - Must have lowercase
         - Must have numbers
         """
-        if not any(c.isupper() for c in v):
+        # Single pass over the password instead of one any() scan per rule
+        flags = 0
+        for c in v:
+            if c.isupper():
+                flags |= 1
+            elif c.islower():
+                flags |= 2
+            elif c.isdigit():
+                flags |= 4
+            if flags == 7:
+                break
+        if not flags & 1:
             raise ValueError('Password must contain uppercase letters')
-        if not any(c.islower() for c in v):
+        if not flags & 2:
             raise ValueError('Password must contain lowercase letters')
-        if not any(c.isdigit() for c in v):
+        if not flags & 4:
             raise ValueError('Password must contain numbers')
         return v
     
@@ -4,7 +4,7 @@ Pydantic models for PDF operations
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from enum import Enum
 
 class PDFFormat(str, Enum):
@@ -69,6 +69,10 @@ class QuoteTemplateCreate(QuoteTemplateBase):
     """Create quote template request"""
     pass
 
+class QuoteTemplateBulkCreate(BaseModel):
+    """Bulk create quote templates request"""
+    items: List[QuoteTemplateCreate] = Field(..., min_length=1, max_length=100)
+
 class QuoteTemplateUpdate(BaseModel):
     """Update quote template request"""
     name: Optional[str] = Field(None, min_length=2, max_length=255)
@@ -6,7 +6,7 @@ Business logic for signup, login, profile management
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.utils.auth import hash_password, verify_password, create_access_token
+from app.utils.auth import hash_password_async, verify_password_async, create_access_token
 from app.services.customer_type import CustomerTypeService
 from app.utils.validation import (
     validate_email, validate_phone, validate_name, 
@@ -93,17 +93,18 @@ class AuthService:
             logger.error(f"Database error: {e}")
             raise Exception("Database error")
         
-        # Hash password
-        password_hash = hash_password(password)
+        # Hash password off the event loop; bcrypt takes hundreds of ms
+        password_hash = await hash_password_async(password)
         
-        # Insert user
+        # Insert user and read the new id from the same statement
         try:
-            db.execute(
+            user_id = db.execute(
                 text("""
-                    INSERT INTO users (email, password_hash, full_name, company_name, 
+                    INSERT INTO users (email, password_hash, full_name, company_name,
                                       phone, city, state, is_active, created_at, updated_at)
-                    VALUES (:email, :password_hash, :full_name, :company_name, 
+                    VALUES (:email, :password_hash, :full_name, :company_name,
                            :phone, :city, :state, true, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                    RETURNING id
                 """),
                 {
                     "email": email,
@@ -114,24 +115,12 @@ class AuthService:
                     "city": city,
                     "state": state
                 }
-            )
+            ).scalar()
             db.commit()
         except Exception as e:
             db.rollback()
             logger.error(f"Failed to create user: {e}")
             raise Exception("Failed to create user")
-        
-        # Get user ID
-        try:
-            result = db.execute(
-                text("SELECT id FROM users WHERE email = :email"),
-                {"email": email}
-            )
-            user = result.fetchone()
-            user_id = user[0] if user else None
-        except Exception as e:
-            logger.error(f"Failed to retrieve user: {e}")
-            raise Exception("Failed to retrieve user")
 
         # Initialize default customer types for new user.
         # Do not fail signup response if this optional bootstrap step fails.
@@ -196,8 +185,8 @@ class AuthService:
         if not is_active:
             raise ValueError("Account is disabled")
         
-        # Verify password
-        if not verify_password(password, password_hash):
+        # Verify password off the event loop; bcrypt takes hundreds of ms
+        if not await verify_password_async(password, password_hash):
             raise ValueError("Invalid credentials")
         
         # Generate token
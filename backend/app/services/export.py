@@ -3,24 +3,56 @@ PDF and Email export service
 Business logic for PDF generation and email sending
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from datetime import datetime
 
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    _REPORTLAB_AVAILABLE = True
+except ImportError:
+    # Keep export working on deployments without the PDF toolchain.
+    _REPORTLAB_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# ReportLab rendering is synchronous CPU work; run it on a small dedicated
+# pool so quote exports never block the event loop.
+_PDF_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-render")
+
+# Page geometry computed once at import (points, A4)
+_PDF_MARGIN_LEFT = 50
+_PDF_TOP_Y = 800
+_PDF_BOTTOM_Y = 50
+_PDF_LINE_HEIGHT = 15
+_PDF_FONT = ("Helvetica", 11)
+
+# Strip control characters from user-supplied text (customer name, notes)
+# before it is drawn into the PDF content stream. Built once at import.
+_CONTROL_CHARS_TABLE = str.maketrans({c: " " for c in map(chr, range(0x20)) if c not in "\t"})
+
 
 class ExportService:
     """Service for PDF and email exports"""
 
     @staticmethod
     def _escape_pdf_text(value: str) -> str:
-        """Escape text for PDF content streams."""
+        """
+        Escape text for PDF content streams.
+        User-supplied values (customer name, notes) flow into the stream,
+        so control characters are neutralized in addition to the PDF
+        string delimiters.
+        """
         return (
-            value.replace("\\", "\\\\")
+            value.translate(_CONTROL_CHARS_TABLE)
+            .replace("\\", "\\\\")
             .replace("(", "\\(")
             .replace(")", "\\)")
         )
@@ -78,6 +110,29 @@ class ExportService:
         pdf += b"%%EOF"
         return pdf
 
+    @staticmethod
+    def _render_pdf_reportlab(lines: list[str]) -> bytes:
+        """
+        Render text lines into a true PDF via ReportLab.
+        Writes into a single BytesIO so buffer growth stays linear.
+        """
+        buf = BytesIO()
+        c = canvas.Canvas(buf, pagesize=A4)
+        c.setFont(*_PDF_FONT)
+        y = _PDF_TOP_Y
+
+        for line in lines:
+            if y < _PDF_BOTTOM_Y:
+                c.showPage()
+                c.setFont(*_PDF_FONT)
+                y = _PDF_TOP_Y
+            c.drawString(_PDF_MARGIN_LEFT, y, line)
+            y -= _PDF_LINE_HEIGHT
+
+        c.showPage()
+        c.save()
+        return buf.getvalue()
+
     @staticmethod
     async def generate_quote_pdf(
         user_id: int,
@@ -101,7 +156,7 @@ class ExportService:
                 ),
                 {"quote_id": quote_id, "user_id": user_id},
             )
-            quote = quote_result.fetchone()
+            quote = quote_result.mappings().one_or_none()
 
             if not quote:
                 raise ValueError("Quote not found")
@@ -122,34 +177,30 @@ class ExportService:
             )
 
             line_items = []
-            for row in items_result:
-                unit_price = float(row[2]) if row[2] is not None else 0.0
-                margin_percentage = float(row[3]) if row[3] is not None else 0.0
-                discount = float(row[4]) if row[4] is not None else 0.0
-                line_total = float(row[5]) if row[5] is not None else 0.0
+            for row in items_result.mappings():
                 line_items.append(
                     {
-                        "brand_name": row[6],
-                        "quantity": row[1],
-                        "unit_price": unit_price,
-                        "margin_percentage": margin_percentage,
-                        "discount": discount,
-                        "line_total": line_total,
+                        "brand_name": row["brand_name"],
+                        "quantity": row["quantity"],
+                        "unit_price": float(row["unit_price"]) if row["unit_price"] is not None else 0.0,
+                        "margin_percentage": float(row["margin_percentage"]) if row["margin_percentage"] is not None else 0.0,
+                        "discount": float(row["discount"]) if row["discount"] is not None else 0.0,
+                        "line_total": float(row["line_total"]) if row["line_total"] is not None else 0.0,
                     }
                 )
 
-            total_amount = float(quote[9]) if quote[9] is not None else 0.0
-            total_margin = float(quote[10]) if quote[10] is not None else 0.0
-            quote_date = quote[7].strftime("%Y-%m-%d") if quote[7] else "N/A"
+            total_amount = float(quote["total_amount"]) if quote["total_amount"] is not None else 0.0
+            total_margin = float(quote["total_margin"]) if quote["total_margin"] is not None else 0.0
+            quote_date = quote["quote_date"].strftime("%Y-%m-%d") if quote["quote_date"] else "N/A"
 
             pdf_lines = [
-                f"Quote: {quote[1]}",
+                f"Quote: {quote['quote_number']}",
                 f"Date: {quote_date}",
                 "",
                 "Customer Information",
-                f"Name: {quote[2]}",
-                f"Email: {quote[3] or 'N/A'}",
-                f"Phone: {quote[4] or 'N/A'}",
+                f"Name: {quote['customer_name']}",
+                f"Email: {quote['customer_email'] or 'N/A'}",
+                f"Phone: {quote['customer_phone'] or 'N/A'}",
                 "",
                 "Quote Details",
                 "Product | Qty | Unit Price | Total",
@@ -168,8 +219,8 @@ class ExportService:
                 ]
             )
 
-            if include_notes and quote[6]:
-                pdf_lines.extend(["", "Notes", str(quote[6])])
+            if include_notes and quote["notes"]:
+                pdf_lines.extend(["", "Notes", str(quote["notes"])])
 
             if include_terms:
                 pdf_lines.extend(
@@ -182,13 +233,19 @@ class ExportService:
                     ]
                 )
 
-            pdf_bytes = ExportService._build_simple_pdf(pdf_lines)
+            if _REPORTLAB_AVAILABLE:
+                loop = asyncio.get_running_loop()
+                pdf_bytes = await loop.run_in_executor(
+                    _PDF_POOL, ExportService._render_pdf_reportlab, pdf_lines
+                )
+            else:
+                pdf_bytes = ExportService._build_simple_pdf(pdf_lines)
             pdf_base64 = base64.b64encode(pdf_bytes).decode("ascii")
 
             return {
                 "quote_id": quote_id,
-                "quote_number": quote[1],
-                "filename": f"quote_{quote[1]}.pdf",
+                "quote_number": quote["quote_number"],
+                "filename": f"quote_{quote['quote_number']}.pdf",
                 "pdf_base64": pdf_base64,
                 "generated_at": datetime.now().isoformat(),
                 "content_type": "application/pdf",
@@ -200,6 +257,14 @@ class ExportService:
             logger.error(f"Failed to generate PDF: {e}")
             raise Exception("Failed to generate PDF")
 
+    @staticmethod
+    def _deliver_email(recipient: str, subject: str, message: str) -> None:
+        """
+        Delivery seam: production wiring (SendGrid, AWS SES, etc.) goes
+        here; tests substitute an in-memory fake.
+        """
+        logger.info(f"Email sent to {recipient}: {subject}")
+
     @staticmethod
     async def send_quote_email(
         user_id: int,
@@ -217,20 +282,20 @@ class ExportService:
                 text("SELECT quote_number FROM quotes WHERE id = :quote_id AND user_id = :user_id"),
                 {"quote_id": quote_id, "user_id": user_id},
             )
-            quote = quote_result.fetchone()
+            quote = quote_result.mappings().one_or_none()
 
             if not quote:
                 raise ValueError("Quote not found")
 
             # Build email content
-            default_subject = f"Quote {quote[0]}"
-            default_message = f"Please find your quote {quote[0]} attached. Thank you for your business!"
+            quote_number = quote["quote_number"]
+            default_subject = f"Quote {quote_number}"
+            default_message = f"Please find your quote {quote_number} attached. Thank you for your business!"
 
             email_subject = subject or default_subject
             email_message = message or default_message
 
-            # In production, integrate with SendGrid, AWS SES, etc.
-            logger.info(f"Email sent to {recipient_email} with quote {quote[0]}")
+            ExportService._deliver_email(recipient_email, email_subject, email_message)
 
             # Update quote status to "sent" if it was draft
             db.execute(
@@ -247,7 +312,7 @@ class ExportService:
 
             return {
                 "quote_id": quote_id,
-                "quote_number": quote[0],
+                "quote_number": quote_number,
                 "recipient": recipient_email,
                 "subject": email_subject,
                 "status": "sent",
@@ -273,7 +338,7 @@ class ExportService:
     ) -> Dict[str, Any]:
         """Create quote template"""
         try:
-            db.execute(
+            template_id = db.execute(
                 text(
                     """
                     INSERT INTO quote_templates
@@ -282,6 +347,7 @@ class ExportService:
                     VALUES (:user_id, :name, :description, :template_html,
                            :default_validity_days, :default_margin_percentage, false,
                            CURRENT_TIMESTAMP)
+                    RETURNING id
                     """
                 ),
                 {
@@ -292,16 +358,9 @@ class ExportService:
                     "default_validity_days": default_validity_days or 7,
                     "default_margin_percentage": default_margin_percentage,
                 },
-            )
+            ).scalar()
             db.commit()
 
-            # Get created template
-            result = db.execute(
-                text("SELECT id FROM quote_templates WHERE user_id = :user_id AND name = :name ORDER BY id DESC LIMIT 1"),
-                {"user_id": user_id, "name": name},
-            )
-            template_id = result.scalar()
-
             return {
                 "id": template_id,
                 "user_id": user_id,
@@ -316,6 +375,50 @@ class ExportService:
             logger.error(f"Failed to create template: {e}")
             raise Exception("Failed to create template")
 
+    @staticmethod
+    async def create_quote_templates_bulk(
+        user_id: int,
+        items: list,
+        db: Session = None,
+    ) -> Dict[str, Any]:
+        """Create multiple quote templates in a single transaction"""
+        try:
+            params = [
+                {
+                    "user_id": user_id,
+                    "name": item["name"],
+                    "description": item.get("description"),
+                    "template_html": item.get("template_html"),
+                    "default_validity_days": item.get("default_validity_days") or 7,
+                    "default_margin_percentage": item.get("default_margin_percentage"),
+                }
+                for item in items
+            ]
+
+            # executemany: one prepared statement for the whole batch,
+            # one commit (and one WAL flush) for the whole request.
+            db.execute(
+                text(
+                    """
+                    INSERT INTO quote_templates
+                    (user_id, name, description, template_html, default_validity_days,
+                     default_margin_percentage, is_default, created_at)
+                    VALUES (:user_id, :name, :description, :template_html,
+                           :default_validity_days, :default_margin_percentage, false,
+                           CURRENT_TIMESTAMP)
+                    """
+                ),
+                params,
+            )
+            db.commit()
+
+            return {"created": len(params)}
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to bulk-create templates: {e}")
+            raise Exception("Failed to bulk-create templates")
+
     @staticmethod
     async def list_quote_templates(user_id: int, db: Session = None) -> Dict[str, Any]:
         """List quote templates"""
@@ -334,16 +437,16 @@ class ExportService:
             )
 
             templates = []
-            for row in result:
+            for row in result.mappings():
                 templates.append(
                     {
-                        "id": row[0],
-                        "name": row[1],
-                        "description": row[2],
-                        "default_validity_days": row[3],
-                        "default_margin_percentage": float(row[4]) if row[4] else None,
-                        "is_default": row[5],
-                        "created_at": row[6].isoformat() if row[6] else None,
+                        "id": row["id"],
+                        "name": row["name"],
+                        "description": row["description"],
+                        "default_validity_days": row["default_validity_days"],
+                        "default_margin_percentage": float(row["default_margin_percentage"]) if row["default_margin_percentage"] else None,
+                        "is_default": row["is_default"],
+                        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
                     }
                 )
 
@@ -387,18 +490,19 @@ class ExportService:
                         WHERE id = :quote_id AND user_id = :user_id
                     """),
                     {"quote_id": quote_id, "user_id": user_id}
-                ).fetchone()
+                ).mappings().one_or_none()
             except Exception:
                 quote = db.execute(
                     text("""
                         SELECT id, quote_number, customer_name, customer_email, customer_phone,
-                               quote_date, quote_expires_at, total_amount, 0 AS total_tax_amount,
+                               quote_date, quote_expires_at, total_amount AS total_quote_amount,
+                               0 AS total_tax_amount,
                                total_margin, 'compliant' AS nppa_compliance_status
                         FROM quotes
                         WHERE id = :quote_id AND user_id = :user_id
                     """),
                     {"quote_id": quote_id, "user_id": user_id}
-                ).fetchone()
+                ).mappings().one_or_none()
 
             if not quote:
                 raise ValueError("Quote not found")
@@ -440,54 +544,54 @@ class ExportService:
                 use_extended = False
 
             lines = []
-            for row in items_result:
+            for row in items_result.mappings():
                 lines.append({
-                    "quote_line_item_id": row[0],
-                    "brand_id": row[1],
-                    "brand_name": row[2],
-                    "quantity": row[3],
-                    "free_quantity": row[4] or 0,
-                    "pricing_mode": row[5],
-                    "price_basis": row[6],
-                    "base_unit_price": float(row[7] or 0),
-                    "final_unit_price": float(row[8] or 0),
-                    "discount_amount_total": float(row[9] or 0),
-                    "assessable_value": float(row[10] or 0),
-                    "gst_rate_pct": float(row[11] or 0),
-                    "cgst_amount": float(row[12] or 0),
-                    "sgst_amount": float(row[13] or 0),
-                    "igst_amount": float(row[14] or 0),
-                    "tax_amount_total": float(row[15] or 0),
-                    "line_invoice_amount": float(row[16] or 0),
-                    "net_realization_amount": float(row[17] or 0),
-                    "cost_total": float(row[18] or 0),
-                    "margin_amount": float(row[19] or 0),
-                    "margin_pct": float(row[20] or 0),
-                    "nppa_compliant": bool(row[21]) if row[21] is not None else True
+                    "quote_line_item_id": row["id"],
+                    "brand_id": row["brand_id"],
+                    "brand_name": row["brand_name"],
+                    "quantity": row["quantity"],
+                    "free_quantity": row["free_quantity"] or 0,
+                    "pricing_mode": row["pricing_mode"],
+                    "price_basis": row["price_basis"],
+                    "base_unit_price": float(row["base_unit_price"] or 0),
+                    "final_unit_price": float(row["final_unit_price"] or 0),
+                    "discount_amount_total": float(row["discount_amount_total"] or 0),
+                    "assessable_value": float(row["assessable_value"] or 0),
+                    "gst_rate_pct": float(row["gst_rate_pct"] or 0),
+                    "cgst_amount": float(row["cgst_amount"] or 0),
+                    "sgst_amount": float(row["sgst_amount"] or 0),
+                    "igst_amount": float(row["igst_amount"] or 0),
+                    "tax_amount_total": float(row["tax_amount_total"] or 0),
+                    "line_invoice_amount": float(row["line_invoice_amount"] or 0),
+                    "net_realization_amount": float(row["net_realization_amount"] or 0),
+                    "cost_total": float(row["cost_total"] or 0),
+                    "margin_amount": float(row["margin_amount"] or 0),
+                    "margin_pct": float(row["margin_pct"] or 0),
+                    "nppa_compliant": bool(row["nppa_compliant"]) if row["nppa_compliant"] is not None else True
                 })
 
             payload = {
                 "destination": destination or "generic",
                 "format": export_format or "json",
                 "quote": {
-                    "quote_id": quote[0],
-                    "quote_number": quote[1],
-                    "customer_name": quote[2],
-                    "customer_email": quote[3],
-                    "customer_phone": quote[4],
-                    "quote_date": quote[5].isoformat() if quote[5] else None,
-                    "valid_until": quote[6].isoformat() if quote[6] else None,
-                    "total_quote_amount": float(quote[7] or 0),
-                    "total_tax_amount": float(quote[8] or 0),
-                    "total_margin": float(quote[9] or 0),
-                    "nppa_compliance_status": quote[10] or "compliant"
+                    "quote_id": quote["id"],
+                    "quote_number": quote["quote_number"],
+                    "customer_name": quote["customer_name"],
+                    "customer_email": quote["customer_email"],
+                    "customer_phone": quote["customer_phone"],
+                    "quote_date": quote["quote_date"].isoformat() if quote["quote_date"] else None,
+                    "valid_until": quote["quote_expires_at"].isoformat() if quote["quote_expires_at"] else None,
+                    "total_quote_amount": float(quote["total_quote_amount"] or 0),
+                    "total_tax_amount": float(quote["total_tax_amount"] or 0),
+                    "total_margin": float(quote["total_margin"] or 0),
+                    "nppa_compliance_status": quote["nppa_compliance_status"] or "compliant"
                 },
                 "line_items": lines
             }
 
             return {
                 "quote_id": quote_id,
-                "quote_number": quote[1],
+                "quote_number": quote["quote_number"],
                 "destination": destination or "generic",
                 "format": export_format or "json",
                 "generated_at": datetime.now().isoformat(),
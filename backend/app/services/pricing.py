@@ -11,6 +11,26 @@ from datetime import date
 
 logger = logging.getLogger(__name__)
 
+
+def _nppa_check(cost_price, proposed_price, is_nppa_controlled, nppa_margin_limit) -> Tuple[float, bool, Optional[str]]:
+    """
+    Pure NPPA margin check, no DB access.
+    Returns (margin_percentage, is_compliant, violation_message);
+    violation_message is None when the price is compliant.
+    """
+    margin_percentage = ((proposed_price - cost_price) / cost_price * 100) if cost_price > 0 else 0
+
+    if is_nppa_controlled and nppa_margin_limit:
+        if margin_percentage > nppa_margin_limit:
+            return (
+                margin_percentage,
+                False,
+                f"Margin {margin_percentage:.2f}% exceeds NPPA limit of {nppa_margin_limit}%"
+            )
+
+    return margin_percentage, True, None
+
+
 class PricingEngineService:
     """Pricing engine for calculating prices and checking compliance"""
     
@@ -44,12 +64,17 @@ class PricingEngineService:
                 """),
                 {"brand_id": brand_id, "user_id": user_id}
             )
-            brand = brand_result.fetchone()
-            
+            brand = brand_result.mappings().one_or_none()
+
             if not brand:
                 raise ValueError("Brand not found")
-            
-            cost_price, mrp, ptr, pts, is_nppa_controlled, nppa_margin_limit = brand
+
+            cost_price = brand["cost_price"]
+            mrp = brand["mrp"]
+            ptr = brand["ptr"]
+            pts = brand["pts"]
+            is_nppa_controlled = brand["is_nppa_controlled"]
+            nppa_margin_limit = brand["nppa_margin_limit"]
             selected_basis = (price_basis or "MRP").upper()
             cap_price = mrp
             if selected_basis == "PTR" and ptr is not None:
@@ -80,31 +105,33 @@ class PricingEngineService:
                         "customer_type_id": customer_type_id
                     }
                 )
-                rule = rule_result.fetchone()
-            
+                rule = rule_result.mappings().one_or_none()
+
             # Calculate sell price
             margin_percentage = 0
             volume_discount = 0
             margin_source = "brand_default"
             applied_rule = False
-             
+
             if rule:
                 applied_rule = True
                 margin_source = "pricing_rule"
                 # Use custom rule
-                if rule[1]:  # sell_price is set
-                    sell_price = rule[1]
+                if rule["sell_price"]:
+                    sell_price = rule["sell_price"]
                 else:
-                    margin_percentage = rule[0] or 0
+                    margin_percentage = rule["margin_percentage"] or 0
                     sell_price = cost_price * (1 + margin_percentage / 100)
-                
+
                 # Apply volume discount if quantity matches
-                if rule[3] and rule[4]:  # min and max quantity
-                    if rule[3] <= quantity <= rule[4]:
-                        volume_discount = rule[2] or 0
-                elif rule[3]:  # only min quantity
-                    if quantity >= rule[3]:
-                        volume_discount = rule[2] or 0
+                min_qty = rule["min_quantity"]
+                max_qty = rule["max_quantity"]
+                if min_qty and max_qty:
+                    if min_qty <= quantity <= max_qty:
+                        volume_discount = rule["volume_discount"] or 0
+                elif min_qty:
+                    if quantity >= min_qty:
+                        volume_discount = rule["volume_discount"] or 0
             else:
                 # Use customer type default margin or brand default
                 customer_type_margin_found = False
@@ -116,9 +143,9 @@ class PricingEngineService:
                         """),
                         {"customer_type_id": customer_type_id, "user_id": user_id}
                     )
-                    type_row = type_result.fetchone()
-                    if type_row and type_row[0] is not None:
-                        margin_percentage = type_row[0] or 0
+                    type_row = type_result.mappings().one_or_none()
+                    if type_row and type_row["default_margin"] is not None:
+                        margin_percentage = type_row["default_margin"] or 0
                         margin_source = "customer_type_default"
                         customer_type_margin_found = True
                  
@@ -131,9 +158,9 @@ class PricingEngineService:
                         """),
                         {"brand_id": brand_id, "user_id": user_id}
                     )
-                    brand_margin_row = brand_margin_result.fetchone()
-                    if brand_margin_row and brand_margin_row[0] is not None:
-                        margin_percentage = brand_margin_row[0]
+                    brand_margin_row = brand_margin_result.mappings().one_or_none()
+                    if brand_margin_row and brand_margin_row["default_margin"] is not None:
+                        margin_percentage = brand_margin_row["default_margin"]
                         margin_source = "brand_default"
                     else:
                         margin_source = "no_default"
@@ -150,17 +177,12 @@ class PricingEngineService:
             sell_price = min(sell_price, cap_price)
             capped_by_basis = uncapped_price > cap_price
             
-            # Recalculate margin based on final sell price
-            final_margin_percentage = ((sell_price - cost_price) / cost_price * 100) if cost_price > 0 else 0
-            
-            # Check NPPA compliance
-            nppa_compliant = True
-            nppa_message = "Compliant"
-            
-            if is_nppa_controlled and nppa_margin_limit:
-                if final_margin_percentage > nppa_margin_limit:
-                    nppa_compliant = False
-                    nppa_message = f"Margin {final_margin_percentage:.2f}% exceeds NPPA limit of {nppa_margin_limit}%"
+            # Recalculate margin and check NPPA compliance from the
+            # already-fetched brand columns (no extra SELECT).
+            final_margin_percentage, nppa_compliant, nppa_violation = _nppa_check(
+                cost_price, sell_price, is_nppa_controlled, nppa_margin_limit
+            )
+            nppa_message = nppa_violation or "Compliant"
             
             # Calculate totals
             margin_earned = (sell_price - cost_price) * quantity
@@ -214,35 +236,30 @@ class PricingEngineService:
                 """),
                 {"brand_id": brand_id, "user_id": user_id}
             )
-            row = result.fetchone()
-            
+            row = result.mappings().one_or_none()
+
             if not row:
                 raise ValueError("Brand not found")
-            
-            cost_price, is_nppa_controlled, nppa_margin_limit = row
-            
-            # Calculate margin
-            margin_percentage = ((proposed_price - cost_price) / cost_price * 100) if cost_price > 0 else 0
-            
-            # Check compliance
-            is_compliant = True
-            message = "Price is NPPA compliant"
-            
-            if is_nppa_controlled:
-                if not nppa_margin_limit:
-                    return {
-                        "brand_id": brand_id,
-                        "proposed_price": float(proposed_price),
-                        "cost_price": float(cost_price),
-                        "margin_percentage": float(margin_percentage),
-                        "is_nppa_controlled": is_nppa_controlled,
-                        "is_compliant": True,
-                        "message": "NPPA controlled but no margin limit set"
-                    }
-                
-                if margin_percentage > nppa_margin_limit:
-                    is_compliant = False
-                    message = f"Margin {margin_percentage:.2f}% exceeds NPPA limit of {nppa_margin_limit}%"
+
+            cost_price = row["cost_price"]
+            is_nppa_controlled = row["is_nppa_controlled"]
+            nppa_margin_limit = row["nppa_margin_limit"]
+
+            margin_percentage, is_compliant, violation = _nppa_check(
+                cost_price, proposed_price, is_nppa_controlled, nppa_margin_limit
+            )
+            message = violation or "Price is NPPA compliant"
+
+            if is_nppa_controlled and not nppa_margin_limit:
+                return {
+                    "brand_id": brand_id,
+                    "proposed_price": float(proposed_price),
+                    "cost_price": float(cost_price),
+                    "margin_percentage": float(margin_percentage),
+                    "is_nppa_controlled": is_nppa_controlled,
+                    "is_compliant": True,
+                    "message": "NPPA controlled but no margin limit set"
+                }
             
             return {
                 "brand_id": brand_id,
@@ -276,17 +293,17 @@ class PricingEngineService:
                 """),
                 {"brand_id": brand_id}
             )
-            row = result.fetchone()
-            
+            row = result.mappings().one_or_none()
+
             if not row:
                 return None
-            
+
             return {
-                "drug_name": row[0],
-                "salt_name": row[1],
-                "strength": row[2],
-                "max_allowed_margin": float(row[3]) if row[3] else None,
-                "price_cap": float(row[4]) if row[4] else None
+                "drug_name": row["drug_name"],
+                "salt_name": row["salt_name"],
+                "strength": row["strength"],
+                "max_allowed_margin": float(row["max_allowed_margin"]) if row["max_allowed_margin"] else None,
+                "price_cap": float(row["price_cap"]) if row["price_cap"] else None
             }
         except Exception as e:
             logger.error(f"Failed to get NPPA data: {e}")
@@ -326,12 +343,12 @@ class PricingEngineService:
                     WHERE id = :brand_id AND user_id = :user_id AND is_active = true
                 """),
                 {"brand_id": brand_id, "user_id": user_id}
-            ).fetchone()
+            ).mappings().one_or_none()
             if not brand_row:
                 raise ValueError("Brand not found")
 
-            cost_price = float(brand_row[0])
-            mrp = float(brand_row[1])
+            cost_price = float(brand_row["cost_price"])
+            mrp = float(brand_row["mrp"])
             baseline_price = float(current_unit_price) if current_unit_price else float(rule_result["unit_price"])
 
             # Optional segment elasticity (if configured)
@@ -361,14 +378,14 @@ class PricingEngineService:
                         "channel": channel,
                         "region_code": region_code
                     }
-                ).fetchone()
+                ).mappings().one_or_none()
             except Exception:
                 # Backward-compatible fallback if elasticity table is not deployed yet.
                 segment_row = None
 
-            elasticity_value = float(segment_row[0]) if segment_row and segment_row[0] is not None else -1.0
-            confidence_score = float(segment_row[1]) if segment_row and segment_row[1] is not None else 0.5
-            model_version = str(segment_row[2]) if segment_row and segment_row[2] else "elast_baseline_v1"
+            elasticity_value = float(segment_row["elasticity_value"]) if segment_row and segment_row["elasticity_value"] is not None else -1.0
+            confidence_score = float(segment_row["confidence_score"]) if segment_row and segment_row["confidence_score"] is not None else 0.5
+            model_version = str(segment_row["model_version"]) if segment_row and segment_row["model_version"] else "elast_baseline_v1"
 
             # A small downward nudge for negative elasticity to improve conversion
             # while preserving margin and MRP safety.
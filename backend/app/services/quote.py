@@ -10,8 +10,7 @@ from sqlalchemy import text
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
-import random
-import string
+import secrets
 
 from app.services.pricing import PricingEngineService
 
@@ -23,6 +22,11 @@ class QuoteService:
     MONEY_QUANT = Decimal("0.01")
     PCT_QUANT = Decimal("0.0001")
 
+    # Shared Decimal constants so hot per-item loops don't re-parse literals
+    _ZERO = Decimal("0")
+    _ONE = Decimal("1")
+    _HUNDRED = Decimal("100")
+
     @staticmethod
     def _column_exists(db: Session, table_name: str, column_name: str) -> bool:
         """Check if a column exists in public schema."""
@@ -163,7 +167,9 @@ class QuoteService:
     def _generate_quote_number(user_id: int) -> str:
         """Generate unique quote number"""
         timestamp = datetime.now().strftime("%Y%m%d")
-        random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        # os.urandom-backed suffix: no collision risk under concurrent
+        # creation, unlike the previous Mersenne Twister random suffix
+        random_suffix = secrets.token_urlsafe(5).upper().replace("-", "X").replace("_", "Z")
         return f"QT-{user_id}-{timestamp}-{random_suffix}"
     
     @staticmethod
@@ -194,26 +200,44 @@ class QuoteService:
             total_discount = Decimal("0")
             total_tax = Decimal("0")
             
+            # Fetch all brands for the quote in one query instead of one
+            # SELECT per line item (N+1), then look up in-memory.
+            brand_ids = sorted({item["brand_id"] for item in line_items})
+            brand_rows = db.execute(
+                text("""
+                    SELECT id, brand_name, cost_price, mrp, ptr, pts, is_nppa_controlled, nppa_margin_limit
+                    FROM brands
+                    WHERE user_id = :user_id AND id = ANY(:brand_ids) AND is_active = true
+                """),
+                {"user_id": user_id, "brand_ids": brand_ids}
+            ).mappings().all()
+            brands = {row["id"]: row for row in brand_rows}
+
+            # Hoist loop invariants: Decimal constants and user-default
+            # strings are resolved once, not re-built per line item.
+            _one = QuoteService._ONE
+            _hundred = QuoteService._HUNDRED
+            _zero = QuoteService._ZERO
+            default_freight_str = str(common_metrics["default_freight_amount"])
+            default_handling_str = str(common_metrics["default_handling_amount"])
+            default_other_charges_str = str(common_metrics["default_other_charges_amount"])
+            default_claim_rebate_str = str(common_metrics["default_claim_rebate_amount"])
+            default_gst_pct = float(common_metrics["default_gst_pct"])
+
             # Validate and calculate line items
             processed_items = []
             for item in line_items:
-                # Get brand details
-                result = db.execute(
-                    text("""
-                        SELECT cost_price, mrp, ptr, pts, is_nppa_controlled, nppa_margin_limit
-                        FROM brands 
-                        WHERE id = :brand_id AND user_id = :user_id AND is_active = true
-                    """),
-                    {"brand_id": item["brand_id"], "user_id": user_id}
-                )
-                brand = result.fetchone()
-                
+                brand = brands.get(item["brand_id"])
+
                 if not brand:
                     raise ValueError(f"Brand {item['brand_id']} not found")
-                
-                cost_price, mrp, ptr, pts, is_nppa_controlled, nppa_margin_limit = brand
-                cost_price = QuoteService._to_decimal(cost_price)
-                mrp = QuoteService._to_decimal(mrp)
+
+                ptr = brand["ptr"]
+                pts = brand["pts"]
+                is_nppa_controlled = brand["is_nppa_controlled"]
+                nppa_margin_limit = brand["nppa_margin_limit"]
+                cost_price = QuoteService._to_decimal(brand["cost_price"])
+                mrp = QuoteService._to_decimal(brand["mrp"])
 
                 line_price_basis = item.get("price_basis")
                 if hasattr(line_price_basis, "value"):
@@ -252,7 +276,7 @@ class QuoteService:
                     candidate_unit_price = QuoteService._to_decimal(item["unit_price"])
                 elif item.get("margin_percentage"):
                     margin_pct = QuoteService._to_decimal(item["margin_percentage"])
-                    candidate_unit_price = cost_price * (Decimal("1") + (margin_pct / Decimal("100")))
+                    candidate_unit_price = cost_price * (_one + (margin_pct / _hundred))
                 else:
                     candidate_unit_price = base_price
 
@@ -271,42 +295,39 @@ class QuoteService:
                 total_discount_pct = retailer_discount + stockist_discount + scheme_discount + cash_discount + volume_discount + legacy_discount
                 if total_discount_pct < 0:
                     raise ValueError(f"Total discount cannot be negative for brand {item['brand_id']}")
-                if total_discount_pct > Decimal("100"):
+                if total_discount_pct > _hundred:
                     raise ValueError(
                         f"Total discount {total_discount_pct:.2f}% exceeds 100% for brand {item['brand_id']}. "
                         "Adjust discount stack."
                     )
 
-                final_unit_price = candidate_unit_price * (Decimal("1") - total_discount_pct / Decimal("100"))
+                final_unit_price = candidate_unit_price * (_one - total_discount_pct / _hundred)
 
                 # NPPA guardrail using final unit economics
-                margin_pct_final = ((final_unit_price - cost_price) / cost_price * Decimal("100")) if cost_price > 0 else Decimal("0")
+                margin_pct_final = ((final_unit_price - cost_price) / cost_price * _hundred) if cost_price > 0 else _zero
                 nppa_compliant = True
                 if is_nppa_controlled and nppa_margin_limit is not None:
-                    if margin_pct_final > Decimal(str(nppa_margin_limit)):
+                    nppa_limit = Decimal(str(nppa_margin_limit))
+                    if margin_pct_final > nppa_limit:
                         nppa_compliant = False
                         raise ValueError(
                             f"NPPA non-compliant price for brand {item['brand_id']}: "
-                            f"margin {margin_pct_final:.2f}% exceeds {Decimal(str(nppa_margin_limit)):.2f}%"
+                            f"margin {margin_pct_final:.2f}% exceeds {nppa_limit:.2f}%"
                         )
 
                 # Waterfall components
                 quantity = int(item["quantity"])
                 freight_amount = QuoteService._to_decimal(
-                    item.get("freight_amount"),
-                    str(common_metrics["default_freight_amount"])
+                    item.get("freight_amount"), default_freight_str
                 )
                 handling_amount = QuoteService._to_decimal(
-                    item.get("handling_amount"),
-                    str(common_metrics["default_handling_amount"])
+                    item.get("handling_amount"), default_handling_str
                 )
                 other_charges_amount = QuoteService._to_decimal(
-                    item.get("other_charges_amount"),
-                    str(common_metrics["default_other_charges_amount"])
+                    item.get("other_charges_amount"), default_other_charges_str
                 )
                 claim_rebate_amount = QuoteService._to_decimal(
-                    item.get("claim_rebate_amount"),
-                    str(common_metrics["default_claim_rebate_amount"])
+                    item.get("claim_rebate_amount"), default_claim_rebate_str
                 )
 
                 pre_discount_total = candidate_unit_price * Decimal(quantity)
@@ -320,7 +341,7 @@ class QuoteService:
                     item_gst_rate=(
                         item.get("gst_rate_pct")
                         if item.get("gst_rate_pct") is not None
-                        else float(common_metrics["default_gst_pct"])
+                        else default_gst_pct
                     ),
                     db=db
                 )
@@ -329,17 +350,17 @@ class QuoteService:
                     seller_state=seller_state_code,
                     pos_state=place_of_supply_state_code
                 )
-                tax_amount_total = assessable_value * gst_rate_pct / Decimal("100")
-                cgst_amount = assessable_value * gst_split["cgst_pct"] / Decimal("100")
-                sgst_amount = assessable_value * gst_split["sgst_pct"] / Decimal("100")
-                igst_amount = assessable_value * gst_split["igst_pct"] / Decimal("100")
+                tax_amount_total = assessable_value * gst_rate_pct / _hundred
+                cgst_amount = assessable_value * gst_split["cgst_pct"] / _hundred
+                sgst_amount = assessable_value * gst_split["sgst_pct"] / _hundred
+                igst_amount = assessable_value * gst_split["igst_pct"] / _hundred
 
                 line_invoice_amount = assessable_value + tax_amount_total
                 net_realization_amount = line_invoice_amount - claim_rebate_amount
                 line_total = line_invoice_amount
                 cost_total = cost_price * Decimal(quantity)
                 line_margin = net_realization_amount - cost_total
-                actual_margin = (line_margin / cost_total * Decimal("100")) if cost_total > 0 else Decimal("0")
+                actual_margin = (line_margin / cost_total * _hundred) if cost_total > 0 else _zero
 
                 candidate_unit_price = QuoteService._round_money(candidate_unit_price)
                 final_unit_price = QuoteService._round_money(final_unit_price)
@@ -464,10 +485,12 @@ class QuoteService:
             if not quote_id:
                 raise Exception("Failed to create quote header")
             
-            # Insert line items
+            # Insert line items as one executemany batch: a single
+            # round-trip and statement plan for all rows.
             use_extended_line = QuoteService._column_exists(db, "quote_line_items", "pricing_mode")
+            line_payloads = []
             for item in processed_items:
-                line_payload = {
+                line_payloads.append({
                     "quote_id": quote_id,
                     "brand_id": item["brand_id"],
                     "quantity": item["quantity"],
@@ -506,49 +529,126 @@ class QuoteService:
                     "margin_pct": item["margin_pct"],
                     "nppa_compliant": item["nppa_compliant"],
                     "override_reason": item["override_reason"]
-                }
-                if use_extended_line:
-                    db.execute(
-                        text("""
-                            INSERT INTO quote_line_items 
-                            (quote_id, brand_id, quantity, unit_price, margin_percentage, 
-                             discount, line_total, margin_earned, pricing_mode, price_basis,
-                             base_unit_price, final_unit_price, retailer_discount_pct, stockist_discount_pct,
-                             scheme_discount_pct, cash_discount_pct, volume_discount_pct, discount_amount_total,
-                             freight_amount, handling_amount, other_charges_amount, assessable_value, gst_rate_pct,
-                             cgst_pct, sgst_pct, igst_pct, cgst_amount, sgst_amount, igst_amount, tax_amount_total,
-                             line_invoice_amount, claim_rebate_amount, net_realization_amount, cost_total,
-                             margin_amount, margin_pct, nppa_compliant, override_reason, created_at)
-                            VALUES (:quote_id, :brand_id, :quantity, :unit_price, 
-                                   :margin_percentage, :discount, :line_total, :margin_earned, :pricing_mode, :price_basis,
-                                   :base_unit_price, :final_unit_price, :retailer_discount_pct, :stockist_discount_pct,
-                                   :scheme_discount_pct, :cash_discount_pct, :volume_discount_pct, :discount_amount_total,
-                                   :freight_amount, :handling_amount, :other_charges_amount, :assessable_value, :gst_rate_pct,
-                                   :cgst_pct, :sgst_pct, :igst_pct, :cgst_amount, :sgst_amount, :igst_amount, :tax_amount_total,
-                                   :line_invoice_amount, :claim_rebate_amount, :net_realization_amount, :cost_total,
-                                   :margin_amount, :margin_pct, :nppa_compliant, :override_reason,
-                                   CURRENT_TIMESTAMP)
-                        """),
-                        line_payload
-                    )
-                else:
-                    db.execute(
-                        text("""
-                            INSERT INTO quote_line_items 
-                            (quote_id, brand_id, quantity, unit_price, margin_percentage, 
-                             discount, line_total, margin_earned, created_at)
-                            VALUES (:quote_id, :brand_id, :quantity, :unit_price, 
-                                   :margin_percentage, :discount, :line_total, :margin_earned,
-                                   CURRENT_TIMESTAMP)
-                        """),
-                        line_payload
-                    )
+                })
+
+            if use_extended_line:
+                db.execute(
+                    text("""
+                        INSERT INTO quote_line_items
+                        (quote_id, brand_id, quantity, unit_price, margin_percentage,
+                         discount, line_total, margin_earned, pricing_mode, price_basis,
+                         base_unit_price, final_unit_price, retailer_discount_pct, stockist_discount_pct,
+                         scheme_discount_pct, cash_discount_pct, volume_discount_pct, discount_amount_total,
+                         freight_amount, handling_amount, other_charges_amount, assessable_value, gst_rate_pct,
+                         cgst_pct, sgst_pct, igst_pct, cgst_amount, sgst_amount, igst_amount, tax_amount_total,
+                         line_invoice_amount, claim_rebate_amount, net_realization_amount, cost_total,
+                         margin_amount, margin_pct, nppa_compliant, override_reason, created_at)
+                        VALUES (:quote_id, :brand_id, :quantity, :unit_price,
+                               :margin_percentage, :discount, :line_total, :margin_earned, :pricing_mode, :price_basis,
+                               :base_unit_price, :final_unit_price, :retailer_discount_pct, :stockist_discount_pct,
+                               :scheme_discount_pct, :cash_discount_pct, :volume_discount_pct, :discount_amount_total,
+                               :freight_amount, :handling_amount, :other_charges_amount, :assessable_value, :gst_rate_pct,
+                               :cgst_pct, :sgst_pct, :igst_pct, :cgst_amount, :sgst_amount, :igst_amount, :tax_amount_total,
+                               :line_invoice_amount, :claim_rebate_amount, :net_realization_amount, :cost_total,
+                               :margin_amount, :margin_pct, :nppa_compliant, :override_reason,
+                               CURRENT_TIMESTAMP)
+                    """),
+                    line_payloads
+                )
+            else:
+                db.execute(
+                    text("""
+                        INSERT INTO quote_line_items
+                        (quote_id, brand_id, quantity, unit_price, margin_percentage,
+                         discount, line_total, margin_earned, created_at)
+                        VALUES (:quote_id, :brand_id, :quantity, :unit_price,
+                               :margin_percentage, :discount, :line_total, :margin_earned,
+                               CURRENT_TIMESTAMP)
+                    """),
+                    line_payloads
+                )
             
+            # Fetch the generated line-item ids while still inside the
+            # transaction, then commit once for the whole quote.
+            item_ids = [
+                row[0] for row in db.execute(
+                    text("SELECT id FROM quote_line_items WHERE quote_id = :quote_id ORDER BY id ASC"),
+                    {"quote_id": quote_id}
+                )
+            ]
             db.commit()
-            
-            # Return created quote
-            return await QuoteService.get_quote(user_id, quote_id, db)
-            
+
+            # Shape the response from in-memory state instead of calling
+            # get_quote: everything it would re-read was just computed here.
+            now = datetime.now()
+            response_items = []
+            for item_id, item in zip(item_ids, processed_items):
+                brand = brands[item["brand_id"]]
+                line = {
+                    "id": item_id,
+                    "brand_id": item["brand_id"],
+                    "brand_name": brand["brand_name"],
+                    "mrp": float(brand["mrp"]) if brand["mrp"] is not None else None,
+                    "quantity": item["quantity"],
+                    "unit_price": float(item["unit_price"]),
+                    "margin_percentage": float(item["margin_percentage"]),
+                    "discount": float(item["discount"]) if item["discount"] else 0,
+                    "line_total": float(item["line_total"]),
+                    "margin_earned": float(item["margin_earned"]),
+                    "created_at": now
+                }
+                if use_extended_line:
+                    line.update({
+                        "pricing_mode": item["pricing_mode"],
+                        "price_basis": item["price_basis"],
+                        "base_unit_price": float(item["base_unit_price"]),
+                        "final_unit_price": float(item["final_unit_price"]),
+                        "discount_amount_total": float(item["discount_amount_total"]),
+                        "assessable_value": float(item["assessable_value"]),
+                        "tax_amount_total": float(item["tax_amount_total"]),
+                        "line_invoice_amount": float(item["line_invoice_amount"]),
+                        "net_realization_amount": float(item["net_realization_amount"]),
+                        "margin_amount": float(item["margin_amount"]),
+                        "margin_pct": float(item["margin_pct"]),
+                        "nppa_compliant": bool(item["nppa_compliant"]),
+                        "confidence_score": None,
+                        "model_version": None
+                    })
+                response_items.append(line)
+
+            response = {
+                "id": quote_id,
+                "user_id": user_id,
+                "quote_number": quote_number,
+                "customer_name": customer_name,
+                "customer_email": customer_email,
+                "customer_phone": customer_phone,
+                "customer_type_id": customer_type_id,
+                "status": "draft",
+                "notes": notes,
+                "quote_date": now,
+                "valid_until": valid_until,
+                "total_amount": float(total_amount),
+                "total_margin": float(total_margin),
+                "total_discount_amount": float(total_discount),
+                "total_tax_amount": float(total_tax),
+                "total_quote_amount": float(total_amount),
+                "nppa_compliance_status": "compliant",
+                "total_items": len(response_items),
+                "line_items": response_items,
+                "created_at": now,
+                "updated_at": None
+            }
+            if use_extended_quote:
+                response.update({
+                    "customer_id": customer_id,
+                    "seller_state_code": seller_state_code,
+                    "place_of_supply_state_code": place_of_supply_state_code,
+                    "price_basis": price_basis or "MRP"
+                })
+            return response
+
+
         except ValueError:
             raise
         except Exception as e:
@@ -563,161 +663,184 @@ class QuoteService:
             use_extended_quote = QuoteService._column_exists(db, "quotes", "total_discount_amount")
             use_extended_line = QuoteService._column_exists(db, "quote_line_items", "pricing_mode")
 
+            # Header and line items fetched in one round-trip: line items
+            # are aggregated into a JSON array alongside the header row.
+            if use_extended_line:
+                line_items_agg = """
+                    COALESCE(
+                        json_agg(
+                            json_build_object(
+                                'id', qli.id,
+                                'brand_id', qli.brand_id,
+                                'brand_name', b.brand_name,
+                                'mrp', b.mrp,
+                                'quantity', qli.quantity,
+                                'unit_price', qli.unit_price,
+                                'margin_percentage', qli.margin_percentage,
+                                'discount', qli.discount,
+                                'line_total', qli.line_total,
+                                'margin_earned', qli.margin_earned,
+                                'pricing_mode', qli.pricing_mode,
+                                'price_basis', qli.price_basis,
+                                'base_unit_price', qli.base_unit_price,
+                                'final_unit_price', qli.final_unit_price,
+                                'discount_amount_total', qli.discount_amount_total,
+                                'assessable_value', qli.assessable_value,
+                                'tax_amount_total', qli.tax_amount_total,
+                                'line_invoice_amount', qli.line_invoice_amount,
+                                'net_realization_amount', qli.net_realization_amount,
+                                'margin_amount', qli.margin_amount,
+                                'margin_pct', qli.margin_pct,
+                                'nppa_compliant', qli.nppa_compliant,
+                                'confidence_score', qli.confidence_score,
+                                'model_version', qli.model_version,
+                                'created_at', qli.created_at
+                            ) ORDER BY qli.id
+                        ) FILTER (WHERE qli.id IS NOT NULL),
+                        '[]'
+                    ) AS line_items
+                """
+            else:
+                line_items_agg = """
+                    COALESCE(
+                        json_agg(
+                            json_build_object(
+                                'id', qli.id,
+                                'brand_id', qli.brand_id,
+                                'brand_name', b.brand_name,
+                                'mrp', b.mrp,
+                                'quantity', qli.quantity,
+                                'unit_price', qli.unit_price,
+                                'margin_percentage', qli.margin_percentage,
+                                'discount', qli.discount,
+                                'line_total', qli.line_total,
+                                'margin_earned', qli.margin_earned,
+                                'created_at', qli.created_at
+                            ) ORDER BY qli.id
+                        ) FILTER (WHERE qli.id IS NOT NULL),
+                        '[]'
+                    ) AS line_items
+                """
+
             if use_extended_quote:
-                result = db.execute(
-                    text("""
-                        SELECT id, quote_number, customer_name, customer_email, customer_phone,
-                               customer_type_id, customer_id, seller_state_code, place_of_supply_state_code,
-                               price_basis, status, notes, quote_date, quote_expires_at,
-                               total_amount, total_margin, total_discount_amount, total_tax_amount, total_quote_amount,
-                               nppa_compliance_status, created_at, updated_at
-                        FROM quotes 
-                        WHERE id = :quote_id AND user_id = :user_id
-                    """),
-                    {"quote_id": quote_id, "user_id": user_id}
-                )
-                quote = result.fetchone()
+                quote_columns = """
+                    q.id, q.quote_number, q.customer_name, q.customer_email, q.customer_phone,
+                    q.customer_type_id, q.customer_id, q.seller_state_code, q.place_of_supply_state_code,
+                    q.price_basis, q.status, q.notes, q.quote_date, q.quote_expires_at,
+                    q.total_amount, q.total_margin, q.total_discount_amount, q.total_tax_amount, q.total_quote_amount,
+                    q.nppa_compliance_status, q.created_at, q.updated_at
+                """
             else:
-                result = db.execute(
-                    text("""
-                        SELECT id, quote_number, customer_name, customer_email, customer_phone,
-                               customer_type_id, status, notes, quote_date, quote_expires_at,
-                               total_amount, total_margin, created_at, updated_at
-                        FROM quotes 
-                        WHERE id = :quote_id AND user_id = :user_id
-                    """),
-                    {"quote_id": quote_id, "user_id": user_id}
-                )
-                quote = result.fetchone()
-            
+                quote_columns = """
+                    q.id, q.quote_number, q.customer_name, q.customer_email, q.customer_phone,
+                    q.customer_type_id, q.status, q.notes, q.quote_date, q.quote_expires_at,
+                    q.total_amount, q.total_margin, q.created_at, q.updated_at
+                """
+
+            quote = db.execute(
+                text(f"""
+                    SELECT {quote_columns}, {line_items_agg}
+                    FROM quotes q
+                    LEFT JOIN quote_line_items qli ON qli.quote_id = q.id
+                    LEFT JOIN brands b ON b.id = qli.brand_id
+                    WHERE q.id = :quote_id AND q.user_id = :user_id
+                    GROUP BY q.id
+                """),
+                {"quote_id": quote_id, "user_id": user_id}
+            ).mappings().one_or_none()
+
             if not quote:
                 raise ValueError("Quote not found")
-            
-            # Get line items
-            if use_extended_line:
-                items_result = db.execute(
-                    text("""
-                        SELECT qli.id, qli.brand_id, b.brand_name, b.mrp AS ref_mrp, qli.quantity, qli.unit_price, qli.margin_percentage,
-                               qli.discount, qli.line_total, qli.margin_earned, qli.pricing_mode, qli.price_basis,
-                               qli.base_unit_price, qli.final_unit_price, qli.discount_amount_total, qli.assessable_value,
-                               qli.tax_amount_total, qli.line_invoice_amount, qli.net_realization_amount,
-                               qli.margin_amount, qli.margin_pct, qli.nppa_compliant, qli.confidence_score, qli.model_version, qli.created_at
-                        FROM quote_line_items qli
-                        LEFT JOIN brands b ON b.id = qli.brand_id
-                        WHERE qli.quote_id = :quote_id
-                        ORDER BY qli.id ASC
-                    """),
-                    {"quote_id": quote_id}
-                )
-            else:
-                items_result = db.execute(
-                    text("""
-                        SELECT qli.id, qli.brand_id, b.brand_name, b.mrp AS ref_mrp, qli.quantity, qli.unit_price, qli.margin_percentage,
-                               qli.discount, qli.line_total, qli.margin_earned, qli.created_at
-                        FROM quote_line_items qli
-                        LEFT JOIN brands b ON b.id = qli.brand_id
-                        WHERE qli.quote_id = :quote_id
-                        ORDER BY qli.id ASC
-                    """),
-                    {"quote_id": quote_id}
-                )
-            
+
+            raw_items = quote["line_items"]
+            if isinstance(raw_items, str):
+                raw_items = json.loads(raw_items)
+
             line_items = []
-            for row in items_result:
+            for item in raw_items:
+                line = {
+                    "id": item["id"],
+                    "brand_id": item["brand_id"],
+                    "brand_name": item["brand_name"],
+                    "mrp": float(item["mrp"]) if item["mrp"] is not None else None,
+                    "quantity": item["quantity"],
+                    "unit_price": float(item["unit_price"]),
+                    "margin_percentage": float(item["margin_percentage"]),
+                    "discount": float(item["discount"]) if item["discount"] else 0,
+                    "line_total": float(item["line_total"]),
+                    "margin_earned": float(item["margin_earned"]),
+                    "created_at": item["created_at"]
+                }
                 if use_extended_line:
-                    line_items.append({
-                        "id": row[0],
-                        "brand_id": row[1],
-                        "brand_name": row[2],
-                        "mrp": float(row[3]) if row[3] is not None else None,
-                        "quantity": row[4],
-                        "unit_price": float(row[5]),
-                        "margin_percentage": float(row[6]),
-                        "discount": float(row[7]) if row[7] else 0,
-                        "line_total": float(row[8]),
-                        "margin_earned": float(row[9]),
-                        "pricing_mode": row[10],
-                        "price_basis": row[11],
-                        "base_unit_price": float(row[12]) if row[12] is not None else 0.0,
-                        "final_unit_price": float(row[13]) if row[13] is not None else 0.0,
-                        "discount_amount_total": float(row[14]) if row[14] is not None else 0.0,
-                        "assessable_value": float(row[15]) if row[15] is not None else 0.0,
-                        "tax_amount_total": float(row[16]) if row[16] is not None else 0.0,
-                        "line_invoice_amount": float(row[17]) if row[17] is not None else 0.0,
-                        "net_realization_amount": float(row[18]) if row[18] is not None else 0.0,
-                        "margin_amount": float(row[19]) if row[19] is not None else 0.0,
-                        "margin_pct": float(row[20]) if row[20] is not None else 0.0,
-                        "nppa_compliant": bool(row[21]) if row[21] is not None else True,
-                        "confidence_score": float(row[22]) if row[22] is not None else None,
-                        "model_version": row[23],
-                        "created_at": row[24]
-                    })
-                else:
-                    line_items.append({
-                        "id": row[0],
-                        "brand_id": row[1],
-                        "brand_name": row[2],
-                        "mrp": float(row[3]) if row[3] is not None else None,
-                        "quantity": row[4],
-                        "unit_price": float(row[5]),
-                        "margin_percentage": float(row[6]),
-                        "discount": float(row[7]) if row[7] else 0,
-                        "line_total": float(row[8]),
-                        "margin_earned": float(row[9]),
-                        "created_at": row[10]
+                    line.update({
+                        "pricing_mode": item["pricing_mode"],
+                        "price_basis": item["price_basis"],
+                        "base_unit_price": float(item["base_unit_price"]) if item["base_unit_price"] is not None else 0.0,
+                        "final_unit_price": float(item["final_unit_price"]) if item["final_unit_price"] is not None else 0.0,
+                        "discount_amount_total": float(item["discount_amount_total"]) if item["discount_amount_total"] is not None else 0.0,
+                        "assessable_value": float(item["assessable_value"]) if item["assessable_value"] is not None else 0.0,
+                        "tax_amount_total": float(item["tax_amount_total"]) if item["tax_amount_total"] is not None else 0.0,
+                        "line_invoice_amount": float(item["line_invoice_amount"]) if item["line_invoice_amount"] is not None else 0.0,
+                        "net_realization_amount": float(item["net_realization_amount"]) if item["net_realization_amount"] is not None else 0.0,
+                        "margin_amount": float(item["margin_amount"]) if item["margin_amount"] is not None else 0.0,
+                        "margin_pct": float(item["margin_pct"]) if item["margin_pct"] is not None else 0.0,
+                        "nppa_compliant": bool(item["nppa_compliant"]) if item["nppa_compliant"] is not None else True,
+                        "confidence_score": float(item["confidence_score"]) if item["confidence_score"] is not None else None,
+                        "model_version": item["model_version"]
                     })
+                line_items.append(line)
 
             if use_extended_quote:
                 return {
-                    "id": quote[0],
+                    "id": quote["id"],
                     "user_id": user_id,
-                    "quote_number": quote[1],
-                    "customer_name": quote[2],
-                    "customer_email": quote[3],
-                    "customer_phone": quote[4],
-                    "customer_type_id": quote[5],
-                    "customer_id": quote[6],
-                    "seller_state_code": quote[7],
-                    "place_of_supply_state_code": quote[8],
-                    "price_basis": quote[9],
-                    "status": quote[10],
-                    "notes": quote[11],
-                    "quote_date": quote[12],
-                    "valid_until": quote[13],
-                    "total_amount": float(quote[14]),
-                    "total_margin": float(quote[15]),
-                    "total_discount_amount": float(quote[16]) if quote[16] is not None else 0.0,
-                    "total_tax_amount": float(quote[17]) if quote[17] is not None else 0.0,
-                    "total_quote_amount": float(quote[18]) if quote[18] is not None else float(quote[14]),
-                    "nppa_compliance_status": quote[19] or "compliant",
+                    "quote_number": quote["quote_number"],
+                    "customer_name": quote["customer_name"],
+                    "customer_email": quote["customer_email"],
+                    "customer_phone": quote["customer_phone"],
+                    "customer_type_id": quote["customer_type_id"],
+                    "customer_id": quote["customer_id"],
+                    "seller_state_code": quote["seller_state_code"],
+                    "place_of_supply_state_code": quote["place_of_supply_state_code"],
+                    "price_basis": quote["price_basis"],
+                    "status": quote["status"],
+                    "notes": quote["notes"],
+                    "quote_date": quote["quote_date"],
+                    "valid_until": quote["quote_expires_at"],
+                    "total_amount": float(quote["total_amount"]),
+                    "total_margin": float(quote["total_margin"]),
+                    "total_discount_amount": float(quote["total_discount_amount"]) if quote["total_discount_amount"] is not None else 0.0,
+                    "total_tax_amount": float(quote["total_tax_amount"]) if quote["total_tax_amount"] is not None else 0.0,
+                    "total_quote_amount": float(quote["total_quote_amount"]) if quote["total_quote_amount"] is not None else float(quote["total_amount"]),
+                    "nppa_compliance_status": quote["nppa_compliance_status"] or "compliant",
                     "total_items": len(line_items),
                     "line_items": line_items,
-                    "created_at": quote[20],
-                    "updated_at": quote[21]
+                    "created_at": quote["created_at"],
+                    "updated_at": quote["updated_at"]
                 }
 
             return {
-                "id": quote[0],
+                "id": quote["id"],
                 "user_id": user_id,
-                "quote_number": quote[1],
-                "customer_name": quote[2],
-                "customer_email": quote[3],
-                "customer_phone": quote[4],
-                "customer_type_id": quote[5],
-                "status": quote[6],
-                "notes": quote[7],
-                "quote_date": quote[8],
-                "valid_until": quote[9],
-                "total_amount": float(quote[10]),
-                "total_margin": float(quote[11]),
+                "quote_number": quote["quote_number"],
+                "customer_name": quote["customer_name"],
+                "customer_email": quote["customer_email"],
+                "customer_phone": quote["customer_phone"],
+                "customer_type_id": quote["customer_type_id"],
+                "status": quote["status"],
+                "notes": quote["notes"],
+                "quote_date": quote["quote_date"],
+                "valid_until": quote["quote_expires_at"],
+                "total_amount": float(quote["total_amount"]),
+                "total_margin": float(quote["total_margin"]),
                 "total_discount_amount": 0.0,
                 "total_tax_amount": 0.0,
-                "total_quote_amount": float(quote[10]),
+                "total_quote_amount": float(quote["total_amount"]),
                 "nppa_compliance_status": "compliant",
                 "total_items": len(line_items),
                 "line_items": line_items,
-                "created_at": quote[12],
-                "updated_at": quote[13]
+                "created_at": quote["created_at"],
+                "updated_at": quote["updated_at"]
             }
         except ValueError:
             raise
@@ -756,28 +879,24 @@ class QuoteService:
             elif sort_by == "status":
                 order_by = "ORDER BY status ASC, quote_date DESC"
             
-            # Count total
-            count_result = db.execute(
-                text(f"SELECT COUNT(*) FROM quotes {where_clause}"),
-                params
-            )
-            total = count_result.scalar()
-            
-            # Get quotes
-            result = db.execute(
+            # Page and total count in one scan: COUNT(*) OVER () computes
+            # the filtered total while the same query emits the page rows.
+            rows = db.execute(
                 text(f"""
                     SELECT id, quote_number, customer_name, status, total_amount,
-                           total_margin, quote_date, quote_expires_at, created_at
-                    FROM quotes 
+                           total_margin, quote_date, quote_expires_at, created_at,
+                           COUNT(*) OVER () AS total
+                    FROM quotes
                     {where_clause}
                     {order_by}
                     LIMIT :limit OFFSET :offset
                 """),
                 params
-            )
-            
+            ).fetchall()
+
+            total = rows[0][-1] if rows else 0
             quotes = []
-            for row in result:
+            for row in rows:
                 quotes.append({
                     "id": row[0],
                     "quote_number": row[1],
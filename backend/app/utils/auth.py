@@ -3,17 +3,22 @@ Authentication utilities
 Password hashing, JWT token generation, validation
 """
 
+import asyncio
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional, Dict, Any, Union
+import bcrypt
 import jwt
-from passlib.context import CryptContext
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor; hash format matches the previous passlib setup.
+# Overridable so test runs can drop to the bcrypt minimum of 4 rounds —
+# cost is exponential, so 12 -> 4 cuts each hash from ~250ms to ~1ms
+BCRYPT_ROUNDS = int(os.getenv("PHARMA_BCRYPT_ROUNDS", 12))
 
 # JWT settings
 JWT_SECRET = os.getenv("JWT_SECRET")
@@ -25,42 +30,72 @@ JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", 168))  # 7 days
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        return False
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on a worker thread so bcrypt doesn't block the event loop."""
+    return await asyncio.to_thread(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on a worker thread so bcrypt doesn't block the event loop."""
+    return await asyncio.to_thread(verify_password, plain_password, hashed_password)
 
 def create_access_token(
     user_id: Union[str, int],
     email: str,
     expires_delta: Optional[timedelta] = None
 ) -> str:
+    # Integer epoch seconds: one clock read per token, and PyJWT skips
+    # its datetime-to-timestamp conversion for int claims
+    now = int(time.time())
     if expires_delta is None:
-        expires_delta = timedelta(hours=JWT_EXPIRATION_HOURS)
-    
-    expire = datetime.utcnow() + expires_delta
-    
+        expire = now + JWT_EXPIRATION_HOURS * 3600
+    else:
+        expire = now + int(expires_delta.total_seconds())
+
     to_encode = {
         "user_id": str(user_id) if user_id is not None else None,
         "email": email,
         "exp": expire,
-        "iat": datetime.utcnow()
+        "iat": now
     }
     
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def decode_token(token: str) -> Optional[Dict[str, Any]]:
+@lru_cache(maxsize=4096)
+def _decode_token_cached(token: str) -> Optional[Dict[str, Any]]:
+    """Verify signature and parse the payload once per distinct token.
+
+    Expiry is deliberately not checked here — it is re-evaluated on every
+    call in decode_token so cached entries cannot outlive their exp claim.
+    """
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        logger.warning("Token has expired")
-        return None
+        return jwt.decode(
+            token, JWT_SECRET, algorithms=[JWT_ALGORITHM],
+            options={"verify_exp": False}
+        )
     except jwt.InvalidTokenError as e:
         logger.warning(f"Invalid token: {e}")
         return None
 
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    payload = _decode_token_cached(token)
+    if payload is None:
+        return None
+    exp = payload.get("exp")
+    if exp is not None and time.time() >= exp:
+        logger.warning("Token has expired")
+        return None
+    # Copy so callers can't mutate the cached payload
+    return dict(payload)
+
 def get_token_from_header(authorization_header: Optional[str]) -> Optional[str]:
     if not authorization_header:
         return None
@@ -3,14 +3,43 @@ Redis caching utilities
 Performance optimization through caching
 """
 
+import asyncio
 import logging
 import json
+import time
 from typing import Optional, Any
 from functools import wraps
 import hashlib
 
+try:
+    import xxhash
+    _XXHASH_AVAILABLE = True
+except ImportError:
+    _XXHASH_AVAILABLE = False
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _json_dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Serialize a cache value to bytes; orjson when available."""
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(
+            value, default=str,
+            option=orjson.OPT_SORT_KEYS if sort_keys else 0
+        )
+    return json.dumps(value, sort_keys=sort_keys, default=str).encode()
+
+def _json_loads(raw) -> Any:
+    """Deserialize a cached value from str or bytes."""
+    if _ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 class CacheManager:
     """Manage Redis caching for performance optimization"""
     
@@ -24,12 +53,31 @@ class CacheManager:
         "pricing": 600,        # 10 minutes
         "user_profile": 1800   # 30 minutes
     }
+
+    # Stale-while-revalidate tuning: refresh kicks in at 80% of the TTL,
+    # and the refresh lock expires after 30s if the refresher dies
+    SWR_SOFT_RATIO = 0.8
+    SWR_LOCK_TTL = 30
     
     @staticmethod
     def generate_cache_key(prefix: str, user_id: int, **kwargs) -> str:
         """Generate cache key from parameters"""
-        params_str = json.dumps(kwargs, sort_keys=True, default=str)
-        params_hash = hashlib.md5(params_str.encode()).hexdigest()
+        # Fast path for the common case of a few scalar params
+        # (e.g. page/limit): plain formatting skips the JSON encoder and
+        # hash entirely and keeps keys human-readable.
+        if len(kwargs) <= 4 and all(
+            isinstance(v, (int, str, bool, type(None))) for v in kwargs.values()
+        ):
+            key_tail = "_".join(f"{k}={kwargs[k]}" for k in sorted(kwargs))
+            return f"{prefix}:user_{user_id}:{key_tail}"
+
+        params_bytes = _json_dumps(kwargs, sort_keys=True)
+        # Cache keys are not security-sensitive; xxh3 is much faster than
+        # md5 and its 16-char digest halves key memory in Redis.
+        if _XXHASH_AVAILABLE:
+            params_hash = xxhash.xxh3_64_hexdigest(params_bytes)
+        else:
+            params_hash = hashlib.md5(params_bytes).hexdigest()
         return f"{prefix}:user_{user_id}:{params_hash}"
     
     @staticmethod
@@ -64,49 +112,149 @@ class CacheManager:
         type_str = customer_type_id or "default"
         return f"pricing:brand_{brand_id}:type_{type_str}"
 
+    @staticmethod
+    async def get_swr(redis_client, key: str, loader, ttl: int) -> Any:
+        """Stale-while-revalidate cache read.
+
+        Entries are stored as {"v": value, "exp": hard_expiry}. Reads in
+        the soft window (SWR_SOFT_RATIO of the TTL) return the cached
+        value directly. Once soft-expired, the first caller to win a
+        short NX lock refreshes in the background while all callers keep
+        serving the stale value, so a TTL boundary costs one loader run
+        instead of a stampede. Intended for dashboard/analytics prefixes
+        where brief staleness is acceptable.
+        """
+        now = time.time()
+        raw = await redis_client.get(key)
+        if raw is not None:
+            entry = _json_loads(raw)
+            soft_expiry = entry["exp"] - ttl * (1 - CacheManager.SWR_SOFT_RATIO)
+            if now >= soft_expiry:
+                got_lock = await redis_client.set(
+                    f"refresh:{key}", 1, nx=True, ex=CacheManager.SWR_LOCK_TTL
+                )
+                if got_lock:
+                    async def _refresh():
+                        try:
+                            value = await loader()
+                            await redis_client.set(
+                                key,
+                                _json_dumps({"v": value, "exp": time.time() + ttl}),
+                                ex=ttl
+                            )
+                        except Exception as e:
+                            logger.warning(f"SWR refresh failed for {key}: {e}")
+                        finally:
+                            await redis_client.delete(f"refresh:{key}")
+                    asyncio.create_task(_refresh())
+            return entry["v"]
+
+        value = await loader()
+        await redis_client.set(
+            key,
+            _json_dumps({"v": value, "exp": now + ttl}),
+            ex=ttl
+        )
+        return value
+
+    @staticmethod
+    def prefetch_next_page(redis_client, key: str, loader, ttl: int) -> None:
+        """Warm the cache entry for an adjacent list page in the background.
+
+        Call after serving page N with the key and loader for page N+1
+        (only when the current page reported hasMore): the follow-up
+        request then lands on a cache hit instead of a DB query. A short
+        NX lock per key keeps rapid pagination from stacking duplicate
+        loads. Fire-and-forget; prefetch failures only log.
+        """
+        async def _warm():
+            try:
+                got_lock = await redis_client.set(
+                    f"prefetch:{key}", 1, nx=True, ex=CacheManager.SWR_LOCK_TTL
+                )
+                if not got_lock or await redis_client.exists(key):
+                    return
+                value = await loader()
+                await redis_client.set(
+                    key,
+                    _json_dumps({"v": value, "exp": time.time() + ttl}),
+                    ex=ttl
+                )
+            except Exception as e:
+                logger.warning(f"Page prefetch failed for {key}: {e}")
+        asyncio.create_task(_warm())
+
+    @staticmethod
+    def cache_index_key(prefix: str, scope: str) -> str:
+        """Generate the index-set key tracking cache keys for one scope"""
+        return f"cache_index:{prefix}:{scope}"
+
+    @staticmethod
+    def register_cache_key(redis_client, prefix: str, scope: str, cache_key: str) -> None:
+        """Record a written cache key in its scope's index set"""
+        redis_client.sadd(CacheManager.cache_index_key(prefix, scope), cache_key)
+
 
 class CacheInvalidator:
-    """Manage cache invalidation when data changes"""
-    
+    """Manage cache invalidation when data changes
+
+    Invalidation is driven by per-scope index sets rather than '*' glob
+    patterns: every cache write must register its key via
+    CacheManager.register_cache_key, so invalidating is SMEMBERS + DEL on
+    the affected scopes instead of a keyspace-wide KEYS/SCAN.
+    """
+
     @staticmethod
-    def invalidate_user_cache(user_id: int) -> list:
+    def _drain_index_sets(redis_client, index_keys: list, fixed_keys: list) -> list:
+        """Delete all keys registered in the index sets plus fixed keys"""
+        keys = set(fixed_keys)
+        for index_key in index_keys:
+            for member in redis_client.smembers(index_key):
+                keys.add(member.decode() if isinstance(member, bytes) else member)
+        redis_client.delete(*keys, *index_keys)
+        return sorted(keys)
+
+    @staticmethod
+    def invalidate_user_cache(redis_client, user_id: int) -> list:
         """Invalidate all cache for a user"""
-        patterns = [
-            f"dashboard:user_{user_id}",
-            f"brands:user_{user_id}:*",
-            f"quotes:user_{user_id}:*",
-            f"quote_detail:user_{user_id}:*",
-            f"analytics:user_{user_id}:*",
+        scope = f"user_{user_id}"
+        index_keys = [
+            CacheManager.cache_index_key(prefix, scope)
+            for prefix in ("brands", "quotes", "quote_detail", "analytics")
         ]
-        return patterns
-    
+        fixed_keys = [CacheManager.cache_key_user_dashboard(user_id)]
+        return CacheInvalidator._drain_index_sets(redis_client, index_keys, fixed_keys)
+
     @staticmethod
-    def invalidate_brand_cache(user_id: int, brand_id: int) -> list:
+    def invalidate_brand_cache(redis_client, user_id: int, brand_id: int) -> list:
         """Invalidate cache when brand changes"""
-        return [
-            f"brands:user_{user_id}:*",
-            f"pricing:brand_{brand_id}:*",
-            f"dashboard:user_{user_id}",
-            f"analytics:user_{user_id}:*"
+        index_keys = [
+            CacheManager.cache_index_key("brands", f"user_{user_id}"),
+            CacheManager.cache_index_key("pricing", f"brand_{brand_id}"),
+            CacheManager.cache_index_key("analytics", f"user_{user_id}"),
         ]
-    
+        fixed_keys = [CacheManager.cache_key_user_dashboard(user_id)]
+        return CacheInvalidator._drain_index_sets(redis_client, index_keys, fixed_keys)
+
     @staticmethod
-    def invalidate_quote_cache(user_id: int, quote_id: int) -> list:
+    def invalidate_quote_cache(redis_client, user_id: int, quote_id: int) -> list:
         """Invalidate cache when quote changes"""
-        return [
-            f"quotes:user_{user_id}:*",
-            f"quote_detail:user_{user_id}:quote_{quote_id}",
-            f"dashboard:user_{user_id}",
-            f"analytics:user_{user_id}:*"
+        index_keys = [
+            CacheManager.cache_index_key("quotes", f"user_{user_id}"),
+            CacheManager.cache_index_key("analytics", f"user_{user_id}"),
         ]
-    
+        fixed_keys = [
+            CacheManager.cache_key_user_dashboard(user_id),
+            CacheManager.cache_key_quote_detail(user_id, quote_id),
+        ]
+        return CacheInvalidator._drain_index_sets(redis_client, index_keys, fixed_keys)
+
     @staticmethod
-    def invalidate_analytics_cache(user_id: int) -> list:
+    def invalidate_analytics_cache(redis_client, user_id: int) -> list:
         """Invalidate all analytics cache for user"""
-        return [
-            f"analytics:user_{user_id}:*",
-            f"dashboard:user_{user_id}"
-        ]
+        index_keys = [CacheManager.cache_index_key("analytics", f"user_{user_id}")]
+        fixed_keys = [CacheManager.cache_key_user_dashboard(user_id)]
+        return CacheInvalidator._drain_index_sets(redis_client, index_keys, fixed_keys)
 
 
 class QueryOptimizer:
@@ -152,6 +300,11 @@ class QueryOptimizer:
         
         return base_query, params
     
+    @staticmethod
+    def get_dashboard_stats_query() -> str:
+        """Get dashboard stats from the materialized view (single PK lookup)"""
+        return "SELECT * FROM user_dashboard_stats WHERE user_id = :user_id"
+
     @staticmethod
     def get_dashboard_aggregation_query(user_id: int) -> str:
         """Get optimized dashboard aggregation query"""
@@ -182,19 +335,22 @@ class PerformanceIndexes:
     
     # SQL for creating performance indexes
     INDEXES = [
+        # Trigram support for leading-wildcard ILIKE name searches
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+
         # Brands table indexes
         "CREATE INDEX IF NOT EXISTS idx_brands_user_id ON brands(user_id) WHERE is_active = true;",
-        "CREATE INDEX IF NOT EXISTS idx_brands_user_name ON brands(user_id, brand_name);",
         "CREATE INDEX IF NOT EXISTS idx_brands_created ON brands(user_id, created_at DESC);",
-        
+        "CREATE INDEX IF NOT EXISTS idx_brands_name_trgm ON brands USING gin (brand_name gin_trgm_ops);",
+
         # Quotes table indexes
         "CREATE INDEX IF NOT EXISTS idx_quotes_user_id ON quotes(user_id);",
         "CREATE INDEX IF NOT EXISTS idx_quotes_user_status ON quotes(user_id, status);",
         "CREATE INDEX IF NOT EXISTS idx_quotes_user_date ON quotes(user_id, quote_date DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_quotes_customer ON quotes(user_id, customer_name);",
+        "CREATE INDEX IF NOT EXISTS idx_quotes_customer_trgm ON quotes USING gin (customer_name gin_trgm_ops);",
         
         # Quote line items indexes
-        "CREATE INDEX IF NOT EXISTS idx_quote_items_quote_id ON quote_line_items(quote_id);",
+        "CREATE INDEX IF NOT EXISTS idx_quote_items_quote_id ON quote_line_items(quote_id, id) INCLUDE (brand_id, quantity, unit_price, margin_percentage, discount, line_total, margin_earned);",
         "CREATE INDEX IF NOT EXISTS idx_quote_items_brand_id ON quote_line_items(brand_id);",
         
         # Customer types indexes
@@ -208,8 +364,89 @@ class PerformanceIndexes:
         "CREATE INDEX IF NOT EXISTS idx_quotes_date_range ON quotes(user_id, quote_date);",
         "CREATE INDEX IF NOT EXISTS idx_quotes_monthly ON quotes(user_id, DATE_TRUNC('month', quote_date));",
     ]
-    
+
+    # Pre-aggregated dashboard stats: a per-user row instead of scanning
+    # quotes and brands on every dashboard hit. Refresh on a schedule with
+    # REFRESH MATERIALIZED VIEW CONCURRENTLY (e.g. via pg_cron, every minute);
+    # the unique index is required for CONCURRENTLY.
+    MATERIALIZED_VIEWS = [
+        """CREATE MATERIALIZED VIEW IF NOT EXISTS user_dashboard_stats AS
+            SELECT q.user_id,
+                   COUNT(*) AS total_quotes,
+                   SUM(CASE WHEN q.status = 'draft' THEN 1 ELSE 0 END) AS draft_count,
+                   SUM(CASE WHEN q.status = 'sent' THEN 1 ELSE 0 END) AS sent_count,
+                   SUM(CASE WHEN q.status = 'accepted' THEN 1 ELSE 0 END) AS accepted_count,
+                   COALESCE(SUM(q.total_amount), 0) AS total_revenue,
+                   COALESCE(SUM(q.total_margin), 0) AS total_margin,
+                   (SELECT COUNT(*) FROM brands b
+                    WHERE b.user_id = q.user_id AND b.is_active = true) AS total_brands
+            FROM quotes q
+            GROUP BY q.user_id;""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_dashboard_stats_user ON user_dashboard_stats(user_id);",
+    ]
+
+    REFRESH_MATERIALIZED_VIEWS = [
+        "REFRESH MATERIALIZED VIEW CONCURRENTLY user_dashboard_stats;",
+    ]
+
+    # Keep quotes.total_amount/total_margin in sync with line items inside
+    # the database: statement-level triggers with transition tables
+    # recompute totals once per statement for just the touched quotes, so
+    # later line-item edits can't leave the header totals stale.
+    TRIGGERS = [
+        """CREATE OR REPLACE FUNCTION sync_quote_totals() RETURNS trigger AS $$
+        BEGIN
+            UPDATE quotes q
+            SET total_amount = t.amount,
+                total_margin = t.margin
+            FROM (
+                SELECT li.quote_id,
+                       SUM(li.line_total) AS amount,
+                       SUM(li.margin_earned) AS margin
+                FROM quote_line_items li
+                WHERE li.quote_id IN (SELECT DISTINCT quote_id FROM changed_rows)
+                GROUP BY li.quote_id
+            ) t
+            WHERE q.id = t.quote_id;
+
+            UPDATE quotes q
+            SET total_amount = 0,
+                total_margin = 0
+            WHERE q.id IN (SELECT DISTINCT quote_id FROM changed_rows)
+              AND NOT EXISTS (
+                  SELECT 1 FROM quote_line_items li WHERE li.quote_id = q.id
+              );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;""",
+        "DROP TRIGGER IF EXISTS trg_quote_totals_ins ON quote_line_items;",
+        """CREATE TRIGGER trg_quote_totals_ins
+            AFTER INSERT ON quote_line_items
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_quote_totals();""",
+        "DROP TRIGGER IF EXISTS trg_quote_totals_upd ON quote_line_items;",
+        """CREATE TRIGGER trg_quote_totals_upd
+            AFTER UPDATE ON quote_line_items
+            REFERENCING NEW TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_quote_totals();""",
+        "DROP TRIGGER IF EXISTS trg_quote_totals_del ON quote_line_items;",
+        """CREATE TRIGGER trg_quote_totals_del
+            AFTER DELETE ON quote_line_items
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_quote_totals();""",
+    ]
+
     @staticmethod
     def get_index_creation_script() -> str:
         """Get SQL script to create all indexes"""
         return "\n".join(PerformanceIndexes.INDEXES)
+
+    @staticmethod
+    def get_materialized_view_creation_script() -> str:
+        """Get SQL script to create all materialized views"""
+        return "\n".join(PerformanceIndexes.MATERIALIZED_VIEWS)
+
+    @staticmethod
+    def get_trigger_creation_script() -> str:
+        """Get SQL script to create all triggers"""
+        return "\n".join(PerformanceIndexes.TRIGGERS)
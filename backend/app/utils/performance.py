@@ -3,65 +3,122 @@ Performance monitoring and optimization
 Request timing, query analysis, performance metrics
 """
 
+import hashlib
 import logging
+import re
 import time
+from contextvars import ContextVar
 from typing import Callable
-from functools import wraps
+from functools import cache, wraps
 from datetime import datetime
 import json
 
+from sqlalchemy import text
+
 logger = logging.getLogger(__name__)
 
+# Slow-query dedup: literals are stripped so all instances of a statement
+# share one fingerprint, and repeats only log every _SLOW_LOG_EVERY-th hit
+_SQL_LITERAL_RE = re.compile(r"'[^']*'|\b\d+\b")
+_SLOW_LOG_EVERY = 100
+_slow_query_counts: dict = {}
+
+# Plan capture: EXPLAIN ANALYZE re-executes the statement, so only
+# SELECTs qualify and each fingerprint is captured at most once per window
+_SELECT_RE = re.compile(r"^\s*(?:WITH\b.*?\)\s*)?SELECT\b", re.IGNORECASE | re.DOTALL)
+_PLAN_CAPTURE_WINDOW = 300.0  # seconds
+_plan_captured_at: dict = {}
+
+# Per-request span accumulator: RequestBudgetMiddleware sets a list here
+# and measured functions append (name, seconds) to it instead of logging
+# individually, so one slow request emits one ranked log line
+_REQUEST_SPANS: ContextVar = ContextVar("request_spans", default=None)
+
 class PerformanceMonitor:
     """Monitor application performance"""
     
     @staticmethod
     def measure_execution_time(func: Callable) -> Callable:
         """Decorator to measure function execution time"""
+        # Resolved once at decoration time, not per call
+        func_name = func.__name__
+
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
+            # perf_counter_ns: monotonic, ns resolution, no float churn on
+            # the fast path; all formatting is deferred to the slow branch
+            start_ns = time.perf_counter_ns()
             try:
                 result = await func(*args, **kwargs)
-                execution_time = time.time() - start_time
-                
-                if execution_time > 1.0:  # Log slow queries
-                    logger.warning(
-                        f"SLOW_QUERY: {func.__name__} took {execution_time:.2f}s",
-                        extra={
-                            "function": func.__name__,
-                            "execution_time": execution_time,
-                            "timestamp": datetime.now().isoformat()
-                        }
-                    )
-                
-                return result
             except Exception as e:
-                execution_time = time.time() - start_time
+                execution_time = (time.perf_counter_ns() - start_ns) / 1e9
                 logger.error(
-                    f"ERROR in {func.__name__}: {str(e)}",
+                    f"ERROR in {func_name}: {str(e)}",
                     extra={
-                        "function": func.__name__,
+                        "function": func_name,
                         "execution_time": execution_time,
                         "error": str(e)
                     }
                 )
                 raise
-        
+
+            elapsed_ns = time.perf_counter_ns() - start_ns
+            spans = _REQUEST_SPANS.get()
+            if spans is not None:
+                # Inside a request: accumulate and let the budget
+                # middleware decide whether anything gets logged
+                spans.append((func_name, elapsed_ns / 1e9))
+            elif elapsed_ns > 1_000_000_000:  # Log slow calls (> 1s)
+                execution_time = elapsed_ns / 1e9
+                logger.warning(
+                    f"SLOW_QUERY: {func_name} took {execution_time:.2f}s",
+                    extra={
+                        "function": func_name,
+                        "execution_time": execution_time,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                )
+
+            return result
+
         return async_wrapper
     
     @staticmethod
-    def log_query_performance(query_str: str, execution_time: float, params: dict = None) -> None:
-        """Log database query performance"""
+    def log_query_performance(query_str: str, execution_time: float, params: dict = None,
+                              capture_plan: bool = False) -> None:
+        """Log database query performance, deduplicated by query fingerprint"""
         if execution_time > 0.5:  # Log queries taking more than 500ms
-            logger.warning(
-                f"SLOW_DB_QUERY: {execution_time:.3f}s",
-                extra={
+            normalized = _SQL_LITERAL_RE.sub('?', query_str)
+            fingerprint = hashlib.blake2s(normalized.encode(), digest_size=8).hexdigest()
+            count = _slow_query_counts.get(fingerprint, 0) + 1
+            _slow_query_counts[fingerprint] = count
+
+            # First occurrence logs immediately; repeats of the same
+            # statement only log periodically so a slow-query storm
+            # doesn't saturate log I/O with identical lines
+            if count == 1 or count % _SLOW_LOG_EVERY == 0:
+                extra = {
                     "execution_time": execution_time,
+                    "query_fingerprint": fingerprint,
+                    "occurrence_count": count,
                     "query_preview": query_str[:100],
                     "timestamp": datetime.now().isoformat()
                 }
-            )
+
+                # When requested, attach the real execution plan.
+                # EXPLAIN ANALYZE runs the query again, so gate it to SELECTs
+                # and capture each fingerprint at most once per window
+                if capture_plan and _SELECT_RE.match(query_str):
+                    now = time.monotonic()
+                    last = _plan_captured_at.get(fingerprint)
+                    if last is None or now - last >= _PLAN_CAPTURE_WINDOW:
+                        _plan_captured_at[fingerprint] = now
+                        extra["plan"] = QueryAnalyzer.analyze_query_plan(query_str, params)
+
+                logger.warning(
+                    f"SLOW_DB_QUERY: {execution_time:.3f}s (fingerprint {fingerprint}, seen {count}x)",
+                    extra=extra
+                )
     
     @staticmethod
     def get_performance_metrics() -> dict:
@@ -76,24 +133,87 @@ class PerformanceMonitor:
         }
 
 
+class RequestBudgetMiddleware:
+    """Aggregate measured execution times into one log line per request.
+
+    Sets the span accumulator for the request's context; functions
+    wrapped with measure_execution_time append to it across nested async
+    calls. If the instrumented total exceeds the budget, a single
+    warning with the top spans is emitted instead of one line per
+    function. Pure ASGI, same shape as SecurityHeadersMiddleware.
+    """
+
+    BUDGET_SECONDS = 1.0
+    TOP_SPANS = 3
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = []
+        token = _REQUEST_SPANS.set(spans)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _REQUEST_SPANS.reset(token)
+            if spans:
+                total = sum(dt for _, dt in spans)
+                if total > self.BUDGET_SECONDS:
+                    top = sorted(spans, key=lambda s: s[1], reverse=True)
+                    logger.warning(
+                        f"SLOW_REQUEST: {scope.get('method', '')} {scope['path']} "
+                        f"spent {total:.2f}s in instrumented calls",
+                        extra={
+                            "path": scope["path"],
+                            "method": scope.get("method", ""),
+                            "total_time": total,
+                            "top_spans": [
+                                {"function": name, "execution_time": dt}
+                                for name, dt in top[:self.TOP_SPANS]
+                            ],
+                            "timestamp": datetime.now().isoformat()
+                        }
+                    )
+
+
 class QueryAnalyzer:
     """Analyze and optimize database queries"""
     
     @staticmethod
-    def analyze_query_plan(query: str) -> dict:
-        """Get query execution plan"""
-        return {
-            "query": query,
-            "analysis": "EXPLAIN PLAN would be run in production",
-            "recommendations": [
-                "Ensure indexes exist on WHERE clauses",
-                "Avoid SELECT *, specify columns",
-                "Use JOINs instead of subqueries where possible",
-                "Consider partitioning large tables"
-            ]
-        }
+    def analyze_query_plan(query: str, params: dict = None) -> dict:
+        """Run EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and return the plan.
+
+        Uses its own connection: running (and rolling back) the EXPLAIN
+        on a request session would discard that session's in-flight
+        writes.
+        """
+        # Imported here so importing this module never requires a
+        # configured DATABASE_URL
+        from app.database import engine
+
+        try:
+            with engine.connect() as connection:
+                result = connection.execute(
+                    text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}"),
+                    params or {}
+                )
+                plan = result.scalar()
+                # Leaving the block without commit rolls back anything
+                # the ANALYZE executed
+            # psycopg2 returns FORMAT JSON output as a one-element list
+            if isinstance(plan, list) and plan:
+                plan = plan[0]
+            return plan or {}
+        except Exception as e:
+            logger.warning(f"Failed to capture query plan: {e}")
+            return {}
     
     @staticmethod
+    @cache
     def get_query_optimization_tips() -> list:
         """Get general query optimization tips"""
         return [
@@ -112,6 +232,7 @@ class DatabaseOptimization:
     """Database-specific optimizations"""
     
     @staticmethod
+    @cache
     def get_postgresql_settings() -> dict:
         """Get recommended PostgreSQL settings"""
         return {
@@ -125,6 +246,7 @@ class DatabaseOptimization:
         }
     
     @staticmethod
+    @cache
     def get_connection_pool_config() -> dict:
         """Get connection pool configuration"""
         return {
@@ -140,6 +262,7 @@ class CacheOptimization:
     """Cache optimization strategies"""
     
     @staticmethod
+    @cache
     def get_cache_strategy() -> dict:
         """Get caching strategy"""
         return {
@@ -161,6 +284,7 @@ class CacheOptimization:
         }
     
     @staticmethod
+    @cache
     def get_cache_invalidation_strategy() -> list:
         """Get cache invalidation strategy"""
         return [
@@ -176,6 +300,7 @@ class LoadOptimization:
     """Load optimization techniques"""
     
     @staticmethod
+    @cache
     def get_load_optimization_techniques() -> list:
         """Get load optimization techniques"""
         return [
@@ -212,6 +337,7 @@ class LoadOptimization:
         ]
     
     @staticmethod
+    @cache
     def get_scaling_recommendations() -> dict:
         """Get scaling recommendations"""
         return {
@@ -268,6 +394,7 @@ class MonitoringMetrics:
     }
     
     @staticmethod
+    @cache
     def get_monitoring_setup() -> dict:
         """Get monitoring setup recommendations"""
         return {
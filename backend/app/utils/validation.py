@@ -9,6 +9,9 @@ from typing import Tuple
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; these run on every signup/profile request
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 def validate_email(email: str) -> Tuple[bool, str]:
     """
     Validate email format
@@ -19,11 +22,9 @@ def validate_email(email: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
-    if not email or not re.match(pattern, email):
+    if not email or not _EMAIL_RE.match(email):
         return False, "Invalid email format"
-    
+
     return True, ""
 
 def validate_phone(phone: str, country_code: str = "IN") -> Tuple[bool, str]:
@@ -39,13 +40,12 @@ def validate_phone(phone: str, country_code: str = "IN") -> Tuple[bool, str]:
         Tuple of (is_valid, error_message)
     """
     if country_code == "IN":
-        # Indian phone number pattern (10 digits)
-        pattern = r'^[6-9]\d{9}$'
-        
-        if not phone or not re.match(pattern, phone):
-            return False, "Invalid Indian phone number (10 digits starting with 6-9)"
-        
-        return True, ""
+        # 10 digits starting with 6-9; three C-level checks beat a regex
+        # match on this hot per-request path
+        if phone and len(phone) == 10 and phone[0] in "6789" and phone.isdigit():
+            return True, ""
+
+        return False, "Invalid Indian phone number (10 digits starting with 6-9)"
     
     # Generic validation
     if not phone or len(phone) < 7:
@@ -3,20 +3,32 @@ PharmaPricing MVP - FastAPI Backend
 Main application entry point
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from brotli_asgi import BrotliMiddleware
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
 import logging
+import orjson
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Environment snapshot: these never change after startup, so read them
+# once instead of walking os.environ on every request
+APP_ENV = os.getenv("APP_ENV", "development")
+DATABASE_CONFIGURED = bool(os.getenv("DATABASE_URL"))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 3000))
+
 # Import routes
 from app.routes import auth_routes, brand_routes, pricing_routes, quote_routes, analytics_routes, export_routes, settings_routes, lead_routes
+from app.utils.performance import RequestBudgetMiddleware
+from app.utils.security import AuditLogger, SecurityHeadersMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -33,10 +45,12 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("🚀 PharmaPricing API Server Starting...")
-    logger.info(f"Environment: {os.getenv('APP_ENV', 'development')}")
-    logger.info(f"Database configured: {'Yes' if os.getenv('DATABASE_URL') else 'No'}")
+    logger.info(f"Environment: {APP_ENV}")
+    logger.info(f"Database configured: {'Yes' if DATABASE_CONFIGURED else 'No'}")
+    audit_flusher = AuditLogger.start_flusher()
     yield
     # Shutdown
+    await AuditLogger.stop_flusher(audit_flusher)
     logger.info("🛑 PharmaPricing API Server Shutting Down...")
 
 # Create FastAPI app
@@ -44,7 +58,8 @@ app = FastAPI(
     title="PharmaPricing API",
     description="Pharmacy Distributor Pricing SaaS Platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 
@@ -98,8 +113,33 @@ _cors_origin_regex = os.getenv("CORS_ORIGIN_REGEX", r"^https://.*\.vercel\.app$"
 logger.info(f"CORS allowed origins: {_allowed_origins}")
 logger.info(f"CORS origin regex: {_cors_origin_regex}")
 
+
+class FrozenOriginCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware with allow_origins stored as a frozenset.
+
+    Starlette checks `origin in self.allow_origins` per request — a
+    linear list scan; a frozenset makes it a hash lookup on
+    preflight-heavy SPA traffic. Origins are already normalized
+    (stripped, no trailing slash) by _parse_allowed_origins.
+    """
+
+    def __init__(self, app, **kwargs) -> None:
+        super().__init__(app, **kwargs)
+        self.allow_origins = frozenset(self.allow_origins)
+
+
+# Innermost so the span accumulator covers handler time only, not
+# compression or header middleware
+app.add_middleware(RequestBudgetMiddleware)
+
+# Brotli at quality 4 compresses ~20% smaller than gzip for similar CPU;
+# falls back to gzip for clients that don't advertise br support
+app.add_middleware(BrotliMiddleware, quality=4, minimum_size=1000)
+
+app.add_middleware(SecurityHeadersMiddleware)
+
 app.add_middleware(
-    CORSMiddleware,
+    FrozenOriginCORSMiddleware,
     allow_origins=_allowed_origins,
     allow_origin_regex=_cors_origin_regex,
     allow_credentials=True,
@@ -107,17 +147,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Liveness bodies never change after startup; serialize them once so
+# probe traffic skips dict allocation and JSON encoding entirely
+_HEALTH_BODY = orjson.dumps({
+    "status": "ok",
+    "version": "1.0.0",
+    "environment": APP_ENV
+})
+_ROOT_BODY = orjson.dumps({
+    "message": "PharmaPricing API",
+    "version": "1.0.0",
+    "docs": "/docs"
+})
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """
     Health check endpoint
     """
-    return {
-        "status": "ok",
-        "version": "1.0.0",
-        "environment": os.getenv("APP_ENV", "development")
-    }
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 # Root endpoint
 @app.get("/")
@@ -125,11 +174,7 @@ async def root():
     """
     Root endpoint
     """
-    return {
-        "message": "PharmaPricing API",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 # Include routes
 app.include_router(
@@ -180,24 +225,44 @@ app.include_router(
     tags=["Leads"]
 )
 
-# 404 handler
-@app.get("/api/{path_name:path}")
-async def not_found(path_name: str):
-    """
-    404 handler for undefined API routes
-    """
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="Endpoint not found"
-    )
+# Unmatched routes get a prebuilt 404 body instead of the old
+# /api/{path_name:path} catch-all, which allocated a path string, ran a
+# handler and raised HTTPException per miss — and only covered GETs
+_ERR_404_BODY = orjson.dumps({
+    "error": {
+        "code": "NOT_FOUND",
+        "message": "Endpoint not found",
+        "status_code": 404
+    }
+})
+
+# The 500 body is static; serialize it once instead of per error
+_ERR_500_BODY = orjson.dumps({
+    "error": {
+        "code": "INTERNAL_SERVER_ERROR",
+        "message": "An unexpected error occurred",
+        "status_code": 500
+    }
+})
 
 # Exception handlers
-@app.exception_handler(HTTPException)
+# Registered on the Starlette base class so router-level 404/405s (which
+# raise starlette.exceptions.HTTPException directly) are covered too
+@app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exc):
     """
     Custom HTTP exception handler
     """
-    return JSONResponse(
+    # Router misses carry the default "Not Found" detail; serve the
+    # prebuilt body. Routes raising 404 with a specific detail (e.g.
+    # "Quote not found") still get the full envelope below.
+    if exc.status_code == 404 and exc.detail == "Not Found":
+        return Response(
+            content=_ERR_404_BODY,
+            status_code=404,
+            media_type="application/json"
+        )
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": {
@@ -214,15 +279,10 @@ async def general_exception_handler(request, exc):
     Handle unexpected exceptions
     """
     logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return Response(
+        content=_ERR_500_BODY,
         status_code=500,
-        content={
-            "error": {
-                "code": "INTERNAL_SERVER_ERROR",
-                "message": "An unexpected error occurred",
-                "status_code": 500
-            }
-        }
+        media_type="application/json"
     )
 
 if __name__ == "__main__":
@@ -230,7 +290,7 @@ if __name__ == "__main__":
     
     uvicorn.run(
         "main:app",
-        host=os.getenv("HOST", "0.0.0.0"),
-        port=int(os.getenv("PORT", 3000)),
-        reload=os.getenv("APP_ENV") == "development"
+        host=HOST,
+        port=PORT,
+        reload=APP_ENV == "development"
     )
@@ -3,10 +3,13 @@ Comprehensive test suite for PharmaPricing MVP
 Tests for all endpoints and functionality
 """
 
+import asyncio
+import statistics
+import time
+import uuid
+
 import pytest
 from httpx import AsyncClient
-from datetime import datetime, timedelta
-import json
 
 class TestAuthentication:
     """Test authentication endpoints"""
@@ -17,7 +20,9 @@ class TestAuthentication:
         response = await client.post(
             "/api/auth/signup",
             json={
-                "email": "test@example.com",
+                # Unique per run so re-runs against the same database
+                # don't trip the duplicate-email check
+                "email": f"test-{uuid.uuid4().hex[:12]}@example.com",
                 "password": "Test@1234",
                 "full_name": "Test User",
                 "company_name": "Test Company",
@@ -27,38 +32,27 @@ class TestAuthentication:
             }
         )
         assert response.status_code == 201
-        assert response.json()["success"] == True
-        assert "user_id" in response.json()["data"]
+        body = response.json()
+        assert body["success"] == True
+        assert "user_id" in body["data"]
     
     @pytest.mark.asyncio
-    async def test_user_login_success(self, client: AsyncClient):
+    async def test_user_login_success(self, client: AsyncClient, signed_up_user):
         """Test successful user login"""
-        # First signup
-        await client.post(
-            "/api/auth/signup",
-            json={
-                "email": "test@example.com",
-                "password": "Test@1234",
-                "full_name": "Test User",
-                "company_name": "Test Company"
-            }
-        )
-        
-        # Then login
+        email, password = signed_up_user
         response = await client.post(
             "/api/auth/login",
             json={
-                "email": "test@example.com",
-                "password": "Test@1234"
+                "email": email,
+                "password": password
             }
         )
         assert response.status_code == 200
         assert "access_token" in response.json()["data"]
     
-    @pytest.mark.asyncio
-    async def test_invalid_email_signup(self, client: AsyncClient):
+    def test_invalid_email_signup(self, sync_client):
         """Test signup with invalid email"""
-        response = await client.post(
+        response = sync_client.post(
             "/api/auth/signup",
             json={
                 "email": "invalid-email",
@@ -79,7 +73,9 @@ class TestBrands:
             "/api/brands",
             headers={"Authorization": f"Bearer {auth_token}"},
             json={
-                "brand_name": "Aspirin 75mg",
+                # Unique per run: the client/token fixtures are shared
+                # across the session, so a fixed name would collide
+                "brand_name": f"Aspirin 75mg {uuid.uuid4().hex[:8]}",
                 "manufacturer": "Bayer",
                 "mrp": 15.00,
                 "cost_price": 13.00,
@@ -90,54 +86,35 @@ class TestBrands:
         assert response.status_code == 201
         assert response.json()["success"] == True
     
-    @pytest.mark.asyncio
-    async def test_list_brands(self, client: AsyncClient, auth_token: str):
-        """Test listing brands"""
-        response = await client.get(
-            "/api/brands",
-            headers={"Authorization": f"Bearer {auth_token}"}
-        )
-        assert response.status_code == 200
-        assert "brands" in response.json()["data"]
-    
-    @pytest.mark.asyncio
-    async def test_search_brands(self, client: AsyncClient, auth_token: str):
-        """Test searching brands"""
-        response = await client.get(
-            "/api/brands?search=aspirin",
-            headers={"Authorization": f"Bearer {auth_token}"}
-        )
-        assert response.status_code == 200
-        assert "brands" in response.json()["data"]
-
 
 class TestPricing:
     """Test pricing engine"""
     
     @pytest.mark.asyncio
-    async def test_calculate_price(self, client: AsyncClient, auth_token: str):
+    async def test_calculate_price(self, client: AsyncClient, auth_token: str, seed_data: dict):
         """Test price calculation"""
         response = await client.post(
             "/api/pricing/calculate",
             headers={"Authorization": f"Bearer {auth_token}"},
             json={
-                "brand_id": 1,
-                "customer_type_id": 1,
+                "brand_id": seed_data["brand_id"],
+                "customer_type_id": seed_data["customer_type_id"],
                 "quantity": 100
             }
         )
         assert response.status_code == 200
-        assert "unit_price" in response.json()["data"]
-        assert "margin_percentage" in response.json()["data"]
+        data = response.json()["data"]
+        assert "unit_price" in data
+        assert "margin_percentage" in data
     
     @pytest.mark.asyncio
-    async def test_nppa_compliance_check(self, client: AsyncClient, auth_token: str):
+    async def test_nppa_compliance_check(self, client: AsyncClient, auth_token: str, seed_data: dict):
         """Test NPPA compliance check"""
         response = await client.post(
             "/api/pricing/check-nppa",
             headers={"Authorization": f"Bearer {auth_token}"},
             json={
-                "brand_id": 1,
+                "brand_id": seed_data["brand_id"],
                 "proposed_price": 35.00
             }
         )
@@ -149,7 +126,7 @@ class TestQuotes:
     """Test quote management"""
     
     @pytest.mark.asyncio
-    async def test_create_quote(self, client: AsyncClient, auth_token: str):
+    async def test_create_quote(self, client: AsyncClient, auth_token: str, seed_data: dict):
         """Test quote creation"""
         response = await client.post(
             "/api/quotes",
@@ -158,11 +135,11 @@ class TestQuotes:
                 "customer_name": "ABC Hospital",
                 "customer_email": "abc@hospital.com",
                 "customer_phone": "9876543210",
-                "customer_type_id": 1,
+                "customer_type_id": seed_data["customer_type_id"],
                 "validity_days": 7,
                 "line_items": [
                     {
-                        "brand_id": 1,
+                        "brand_id": seed_data["brand_id"],
                         "quantity": 100,
                         "margin_percentage": 15
                     }
@@ -171,51 +148,74 @@ class TestQuotes:
         )
         assert response.status_code == 201
         assert "quote_number" in response.json()["data"]
-    
-    @pytest.mark.asyncio
-    async def test_list_quotes(self, client: AsyncClient, auth_token: str):
-        """Test listing quotes"""
-        response = await client.get(
-            "/api/quotes",
-            headers={"Authorization": f"Bearer {auth_token}"}
-        )
-        assert response.status_code == 200
-        assert "quotes" in response.json()["data"]
 
 
-class TestAnalytics:
-    """Test analytics dashboard"""
-    
+class TestGetEndpointShapes:
+    """Shape checks for authenticated GET endpoints.
+
+    These all followed the same pattern (GET with auth, assert 200,
+    assert keys in data), so one parametrized test replaces the five
+    separate list/search/dashboard tests.
+    """
+
+    SHAPES = [
+        ("/api/brands", ("brands",)),
+        ("/api/brands?search=aspirin", ("brands",)),
+        ("/api/quotes", ("quotes",)),
+        ("/api/analytics/dashboard", ("total_revenue", "total_quotes")),
+        ("/api/analytics/revenue-trend?range_type=month", ("data_points",)),
+    ]
+
+    @pytest.mark.parametrize("url,keys", SHAPES)
     @pytest.mark.asyncio
-    async def test_get_dashboard(self, client: AsyncClient, auth_token: str):
-        """Test dashboard metrics"""
+    async def test_get_endpoint_shape(self, client: AsyncClient, auth_token: str, url: str, keys: tuple):
+        """GET with auth returns 200 and the expected data keys"""
         response = await client.get(
-            "/api/analytics/dashboard",
+            url,
             headers={"Authorization": f"Bearer {auth_token}"}
         )
         assert response.status_code == 200
-        assert "total_revenue" in response.json()["data"]
-        assert "total_quotes" in response.json()["data"]
-    
+        data = response.json()["data"]
+        for key in keys:
+            assert key in data
+
     @pytest.mark.asyncio
-    async def test_revenue_trend(self, client: AsyncClient, auth_token: str):
-        """Test revenue trend"""
-        response = await client.get(
-            "/api/analytics/revenue-trend?range_type=month",
-            headers={"Authorization": f"Bearer {auth_token}"}
+    async def test_get_endpoints_concurrently(self, client: AsyncClient, auth_token: str):
+        """All read-only GETs can be serviced concurrently on one loop"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        responses = await asyncio.gather(
+            *(client.get(url, headers=headers) for url, _ in self.SHAPES)
         )
-        assert response.status_code == 200
-        assert "data_points" in response.json()["data"]
+        for (url, keys), response in zip(self.SHAPES, responses):
+            assert response.status_code == 200, url
+            data = response.json()["data"]
+            for key in keys:
+                assert key in data
 
 
 class TestExport:
     """Test export functionality"""
     
     @pytest.mark.asyncio
-    async def test_export_quote_pdf(self, client: AsyncClient, auth_token: str):
-        """Test PDF export"""
+    async def test_export_quote_pdf(self, client: AsyncClient, auth_token: str, seed_data: dict, stub_pdf_renderer):
+        """Test PDF export (renderer stubbed; asserts on the envelope)"""
+        response = await client.post(
+            f"/api/quotes/{seed_data['quote_id']}/export-pdf",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            json={
+                "include_terms": True,
+                "include_notes": True
+            }
+        )
+        assert response.status_code == 200
+        assert "pdf_base64" in response.json()["data"]
+
+    @pytest.mark.slow
+    @pytest.mark.asyncio
+    async def test_export_quote_pdf_real_renderer(self, client: AsyncClient, auth_token: str, seed_data: dict):
+        """End-to-end PDF export with the real renderer (run with -m slow)"""
         response = await client.post(
-            "/api/quotes/1/export-pdf",
+            f"/api/quotes/{seed_data['quote_id']}/export-pdf",
             headers={"Authorization": f"Bearer {auth_token}"},
             json={
                 "include_terms": True,
@@ -226,10 +226,10 @@ class TestExport:
         assert "pdf_base64" in response.json()["data"]
     
     @pytest.mark.asyncio
-    async def test_send_quote_email(self, client: AsyncClient, auth_token: str):
+    async def test_send_quote_email(self, client: AsyncClient, auth_token: str, seed_data: dict, fake_mailer: list):
         """Test email sending"""
         response = await client.post(
-            "/api/quotes/1/send-email",
+            f"/api/quotes/{seed_data['quote_id']}/send-email",
             headers={"Authorization": f"Bearer {auth_token}"},
             json={
                 "recipient_email": "test@example.com",
@@ -238,21 +238,21 @@ class TestExport:
             }
         )
         assert response.status_code == 200
+        assert len(fake_mailer) == 1
+        assert fake_mailer[0]["recipient"] == "test@example.com"
 
 
 class TestSecurity:
     """Test security features"""
     
-    @pytest.mark.asyncio
-    async def test_missing_auth_token(self, client: AsyncClient):
+    def test_missing_auth_token(self, sync_client):
         """Test missing authentication token"""
-        response = await client.get("/api/brands")
+        response = sync_client.get("/api/brands")
         assert response.status_code == 401
-    
-    @pytest.mark.asyncio
-    async def test_invalid_auth_token(self, client: AsyncClient):
+
+    def test_invalid_auth_token(self, sync_client):
         """Test invalid authentication token"""
-        response = await client.get(
+        response = sync_client.get(
             "/api/brands",
             headers={"Authorization": "Bearer invalid_token"}
         )
@@ -267,10 +267,9 @@ class TestSecurity:
         )
         assert response.status_code == 200  # Should sanitize
     
-    @pytest.mark.asyncio
-    async def test_invalid_password_signup(self, client: AsyncClient):
+    def test_invalid_password_signup(self, sync_client):
         """Test weak password rejection"""
-        response = await client.post(
+        response = sync_client.post(
             "/api/auth/signup",
             json={
                 "email": "test@example.com",
@@ -286,15 +285,23 @@ class TestPerformance:
     
     @pytest.mark.asyncio
     async def test_response_time_under_200ms(self, client: AsyncClient, auth_token: str):
-        """Test response time is acceptable"""
-        import time
-        start = time.time()
-        response = await client.get(
-            "/api/brands",
-            headers={"Authorization": f"Bearer {auth_token}"}
-        )
-        elapsed = time.time() - start
-        assert elapsed < 0.2  # 200ms
+        """Test median response time is acceptable"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        # Warmup: connection pool, import caches, first-hit costs
+        for _ in range(3):
+            await client.get("/api/brands", headers=headers)
+
+        samples = []
+        for _ in range(20):
+            start = time.perf_counter()
+            response = await client.get("/api/brands", headers=headers)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200
+
+        # Median over 20 rounds: one cold-cache outlier no longer fails
+        # the suite the way the old single time.time() sample did
+        assert statistics.median(samples) < 0.2  # 200ms
     
     @pytest.mark.asyncio
     async def test_pagination_performance(self, client: AsyncClient, auth_token: str):
@@ -305,36 +312,3 @@ class TestPerformance:
         )
         assert response.status_code == 200
         assert len(response.json()["data"]["brands"]) <= 50
-
-
-# Conftest fixtures
-
-@pytest.fixture
-async def client():
-    """Create test client"""
-    from app.main import app
-    async with AsyncClient(app=app, base_url="http://test") as client:
-        yield client
-
-@pytest.fixture
-async def auth_token(client: AsyncClient):
-    """Create authenticated token"""
-    signup_response = await client.post(
-        "/api/auth/signup",
-        json={
-            "email": f"test{datetime.now().timestamp()}@example.com",
-            "password": "Test@1234",
-            "full_name": "Test User",
-            "company_name": "Test Company"
-        }
-    )
-    
-    login_response = await client.post(
-        "/api/auth/login",
-        json={
-            "email": signup_response.json()["data"]["email"],
-            "password": "Test@1234"
-        }
-    )
-    
-    return login_response.json()["data"]["access_token"]